@@ -1,7 +1,14 @@
 from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
 
-from recipes.models import Ingredient, Recipe, Favorite, ShoppingCart
+from recipes.models import (AmountIngredient, Ingredient, Recipe, Favorite,
+                            ShoppingCart, Tag)
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    """
+    Фильтр по списку чисел через запятую: ?ingredients=1,2.
+    """
 
 
 class RecipeFilter(filters.FilterSet):
@@ -16,33 +23,68 @@ class RecipeFilter(filters.FilterSet):
         field_name='is_in_shopping_cart',
         method='shopping_cart_filter'
     )
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    # Проверяет slug по таблице тэгов: AllValuesMultipleFilter на каждом
+    # запросе собирал варианты DISTINCT-запросом по всем рецептам.
+    tags = filters.ModelMultipleChoiceFilter(
+        field_name='tags__slug', to_field_name='slug',
+        queryset=Tag.objects.all(),
+    )
+    cooking_time_min = filters.NumberFilter(
+        field_name='cooking_time', lookup_expr='gte'
+    )
+    cooking_time_max = filters.NumberFilter(
+        field_name='cooking_time', lookup_expr='lte'
+    )
+    ingredients = NumberInFilter(method='ingredients_filter')
+    exclude_ingredients = NumberInFilter(method='exclude_ingredients_filter')
 
-    def favorite_filter(self, queryset, name, value):
+    def flag_filter(self, queryset, name, value, model):
+        """
+        Фильтрует по флагу is_favorited/is_in_shopping_cart.
+
+        Если RecipeViewSet уже добавил аннотацию с Exists, фильтр
+        использует ее, не добавляя JOIN и второй подзапрос.
+        """
         user = self.request.user
-        if user.is_authenticated:
-            queryset = queryset.annotate(
-                is_favorited=Exists(
-                    Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
-                )
-            )
-            return queryset.filter(favorite__user=user)
+        if not user.is_authenticated:
+            return queryset.none() if value else queryset
+        if name not in queryset.query.annotations:
+            queryset = queryset.annotate(**{name: Exists(model.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            ))})
+        return queryset.filter(**{name: value})
+
+    def favorite_filter(self, queryset, name, value):
+        return self.flag_filter(queryset, name, value, Favorite)
 
     def shopping_cart_filter(self, queryset, name, value):
-        user = self.request.user
-        if user.is_authenticated:
-            queryset = queryset.annotate(
-                is_in_shopping_cart=Exists(
-                    ShoppingCart.objects.filter(
-                        user=user, recipe=OuterRef('pk')
-                    )
-                )
-            )
-            return queryset.filter(shopping_cart__user=user)
+        return self.flag_filter(queryset, name, value, ShoppingCart)
+
+    def ingredients_filter(self, queryset, name, value):
+        """
+        Рецепты, в которых есть все перечисленные ингредиенты.
+        """
+        for ingredient_id in set(value):
+            queryset = queryset.filter(Exists(AmountIngredient.objects.filter(
+                ingredients_id=ingredient_id, recipe=OuterRef('pk')
+            )))
+        return queryset
+
+    def exclude_ingredients_filter(self, queryset, name, value):
+        """
+        Рецепты без единого из перечисленных ингредиентов.
+        """
+        return queryset.filter(~Exists(AmountIngredient.objects.filter(
+            ingredients_id__in=value, recipe=OuterRef('pk')
+        )))
 
     class Meta:
         model = Recipe
-        fields = ('is_favorited', 'author', 'tags', 'is_in_shopping_cart',)
+        fields = (
+            'is_favorited', 'author', 'tags', 'is_in_shopping_cart',
+            'cooking_time_min', 'cooking_time_max',
+            'ingredients', 'exclude_ingredients',
+        )
 
 
 class IngredientFilter(filters.FilterSet):
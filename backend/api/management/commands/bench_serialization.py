@@ -0,0 +1,83 @@
+import json
+from time import perf_counter
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from api.renderers import FastJSONRenderer
+from api.serializers import RecipeSerializer
+from api.views import RecipeViewSet
+from recipes.representations import get_recipes_data
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость сериализации списка рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--user', help='username, от имени которого строится ответ'
+        )
+
+    def get_request(self, username):
+        setup_test_environment()
+        request = Request(RequestFactory().get('/api/recipes/'))
+        if username:
+            request.user = User.objects.get(username=username)
+        else:
+            request.user = AnonymousUser()
+        return request
+
+    def drf_path(self, view, request, limit):
+        recipes = view.get_queryset()[:limit]
+        data = RecipeSerializer(
+            recipes, many=True, context={'request': request}
+        ).data
+        return len(data), JSONRenderer().render(data)
+
+    def fast_path(self, view, request, limit):
+        rows = view.get_values(view.get_queryset())[:limit]
+        data = get_recipes_data(rows, request)
+        return len(data), FastJSONRenderer().render(data)
+
+    def measure(self, path, view, request, options):
+        with CaptureQueriesContext(connection) as queries:
+            count, body = path(view, request, options['limit'])
+        if not count:
+            raise CommandError('В базе нет рецептов')
+        started = perf_counter()
+        for _ in range(options['repeat']):
+            path(view, request, options['limit'])
+        elapsed = perf_counter() - started
+        return body, {
+            'recipes': count,
+            'queries': len(queries),
+            'bytes': len(body),
+            'us_per_recipe': round(
+                elapsed / options['repeat'] / count * 1e6, 1
+            ),
+        }
+
+    def handle(self, *args, **options):
+        request = self.get_request(options['user'])
+        view = RecipeViewSet(
+            request=request, action='list', format_kwarg=None
+        )
+        drf_body, drf_stats = self.measure(
+            self.drf_path, view, request, options
+        )
+        fast_body, fast_stats = self.measure(
+            self.fast_path, view, request, options
+        )
+        self.stdout.write(json.dumps({
+            'drf': drf_stats,
+            'fast': fast_stats,
+            'identical': drf_body == fast_body,
+        }, indent=2))
@@ -0,0 +1,99 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from api.management.commands.run_benchmarks import get_commit
+
+# Загружает приложение так же, как воркер gunicorn перед первым запросом.
+BOOT_SCRIPT = '''
+import json, resource, sys, time
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+boot = time.perf_counter() - start
+print(json.dumps({
+    'boot_ms': boot * 1000,
+    'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'modules': sorted(sys.modules),
+}))
+'''
+HEAVY_MODULES = (
+    'PIL', 'coreapi', 'jinja2', 'numpy', 'pkg_resources', 'reportlab',
+    'rest_framework_simplejwt', 'scipy', 'social_core',
+)
+
+
+def parse_import_times(stderr):
+    """
+    Модули с наибольшим суммарным временем импорта из -X importtime.
+    """
+    times = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times.append((int(cumulative) / 1000, name.strip()))
+    return sorted(times, reverse=True)
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время загрузки приложения и память воркера '
+            'после старта')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--top', type=int, default=15,
+                            help='сколько самых долгих импортов показать')
+        parser.add_argument('--output', help='файл для JSON-отчета')
+
+    def boot(self, *flags):
+        result = subprocess.run(
+            (sys.executable, *flags, '-c', BOOT_SCRIPT),
+            capture_output=True, text=True, cwd=settings.BASE_DIR,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr)
+        return json.loads(result.stdout.splitlines()[-1]), result.stderr
+
+    def handle(self, *args, **options):
+        runs = [self.boot()[0] for _ in range(options['repeat'])]
+        _, stderr = self.boot('-X', 'importtime')
+        modules = runs[0]['modules']
+        report = {
+            'commit': get_commit(),
+            'python': sys.version.split()[0],
+            'repeat': options['repeat'],
+            'boot_ms': statistics.median(run['boot_ms'] for run in runs),
+            'rss_mb': statistics.median(
+                run['rss_kb'] for run in runs
+            ) / 1024,
+            'modules': len(modules),
+            'heavy_modules': [
+                name for name in HEAVY_MODULES if name in modules
+            ],
+            'slowest_imports': [
+                {'module': name, 'ms': ms} for ms, name in
+                parse_import_times(stderr)[:options['top']]
+            ],
+        }
+        self.stdout.write(
+            f'Загрузка: {report["boot_ms"]:.0f} мс, '
+            f'память: {report["rss_mb"]:.1f} МБ, '
+            f'модулей: {report["modules"]}'
+        )
+        if report['heavy_modules']:
+            self.stdout.write(self.style.WARNING(
+                'Загружены при старте: '
+                + ', '.join(report['heavy_modules'])
+            ))
+        for item in report['slowest_imports']:
+            self.stdout.write(f'{item["ms"]:8.1f} мс  {item["module"]}')
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
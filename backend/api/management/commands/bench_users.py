@@ -0,0 +1,81 @@
+import json
+
+from django.conf import settings
+from django.core.management import BaseCommand, call_command
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment
+from rest_framework.authtoken.models import Token
+
+from api.management.commands.run_benchmarks import Command as Benchmarks
+from api.management.commands.run_benchmarks import get_commit
+from users.models import User
+
+PREFIX = 'bench_user_'
+
+
+class Command(BaseCommand):
+    help = ('Замеряет список и поиск пользователей на большом числе '
+            'пользователей, при необходимости создавая их')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000000,
+                            help='сколько пользователей должно быть в базе')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--output', help='файл для JSON-отчета')
+
+    def create_users(self, count):
+        missing = count - User.objects.count()
+        if missing <= 0:
+            return
+        # Следующая пачка получает свой префикс, чтобы имена не совпали
+        # с созданными прошлым запуском.
+        batch = User.objects.filter(username__startswith=PREFIX).count()
+        call_command(
+            'generate_data', users=missing, recipes=0, follows=0,
+            favorites=0, carts=0, prefix=f'{PREFIX}{batch}_',
+            stdout=self.stdout,
+        )
+
+    def handle(self, *args, **options):
+        self.create_users(options['users'])
+        with override_settings(REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}
+        }):
+            self.run(options)
+
+    def run(self, options):
+        setup_test_environment()
+        user = User.objects.order_by('-id').first()
+        token, _ = Token.objects.get_or_create(user=user)
+        client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+        # Префикс, под который попадает несколько десятков имен.
+        prefix = user.username[:-2]
+        page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+        scenarios = {
+            'users_list': '/api/users/',
+            'users_list_deep_page': (
+                f'/api/users/?page={max(User.objects.count() // page_size, 1)}'
+            ),
+            'users_search': f'/api/users/?search={prefix}',
+        }
+        benchmarks = Benchmarks()
+        report = {
+            'commit': get_commit(),
+            'database': connection.vendor,
+            'users': User.objects.count(),
+            'repeat': options['repeat'],
+            'results': {
+                name: benchmarks.run_scenario(client, url, options['repeat'])
+                for name, url in scenarios.items()
+            },
+            # План показывает, использует ли поиск индекс по префиксу.
+            'search_plan': User.objects.filter(
+                username__istartswith=prefix
+            ).explain(),
+        }
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        self.stdout.write(output)
@@ -0,0 +1,173 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from http.client import HTTPConnection
+from time import monotonic, perf_counter, sleep
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from api.management.commands.run_benchmarks import get_commit, percentile
+
+START_TIMEOUT = 30
+# Лимиты частоты запросов не должны ограничивать нагрузочный тест.
+SERVER_ENV = {
+    'THROTTLE_RATE_ANON': '1000000/s',
+    'THROTTLE_RATE_USER': '1000000/s',
+}
+
+
+def run_client(port, path, threads, duration):
+    """
+    Шлет запросы из нескольких потоков одного процесса до истечения
+    duration секунд и возвращает задержки в мс и число ошибок.
+    """
+    latencies = []
+    errors = []
+    deadline = monotonic() + duration
+
+    def worker():
+        connection = HTTPConnection('127.0.0.1', port, timeout=30)
+        while monotonic() < deadline:
+            start = perf_counter()
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+            except OSError:
+                connection.close()
+                errors.append(1)
+                continue
+            if response.status != 200:
+                errors.append(1)
+                continue
+            latencies.append((perf_counter() - start) * 1000)
+        connection.close()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return latencies, len(errors)
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест gunicorn с разным числом воркеров: '
+            'пропускная способность и задержки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, nargs='+',
+                            default=[1, 2, 4])
+        parser.add_argument('--threads', type=int, default=1,
+                            help='потоков в каждом воркере gunicorn')
+        parser.add_argument('--concurrency', type=int, default=32,
+                            help='одновременных соединений клиента')
+        parser.add_argument('--clients', type=int,
+                            default=max(os.cpu_count() // 2, 1),
+                            help='процессов, генерирующих нагрузку')
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument('--warmup', type=float, default=2)
+        parser.add_argument('--path', default='/api/recipes/?limit=6')
+        parser.add_argument('--port', type=int, default=9100)
+        parser.add_argument('--output', help='файл для JSON-отчета')
+
+    def start_server(self, workers, threads, port):
+        server = subprocess.Popen(
+            (
+                sys.executable, '-m', 'gunicorn',
+                '--config', 'gunicorn.conf.py',
+                '--bind', f'127.0.0.1:{port}',
+                '--workers', str(workers),
+                '--threads', str(threads),
+                'foodgram.wsgi',
+            ),
+            cwd=settings.BASE_DIR,
+            env={**os.environ, **SERVER_ENV},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = monotonic() + START_TIMEOUT
+        while monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError('gunicorn завершился при запуске')
+            try:
+                socket.create_connection(('127.0.0.1', port), 1).close()
+                return server
+            except OSError:
+                sleep(0.2)
+        self.stop_server(server)
+        raise CommandError('gunicorn не запустился')
+
+    def stop_server(self, server):
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(START_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+    def load(self, executor, options, duration):
+        clients = options['clients']
+        threads = max(options['concurrency'] // clients, 1)
+        futures = [
+            executor.submit(
+                run_client, options['port'], options['path'], threads,
+                duration,
+            ) for _ in range(clients)
+        ]
+        latencies, errors = [], 0
+        for future in futures:
+            client_latencies, client_errors = future.result()
+            latencies += client_latencies
+            errors += client_errors
+        return latencies, errors
+
+    def handle(self, *args, **options):
+        report = {
+            'commit': get_commit(),
+            'cpu_count': os.cpu_count(),
+            'path': options['path'],
+            'threads': options['threads'],
+            'concurrency': options['concurrency'],
+            'duration': options['duration'],
+            'results': {},
+        }
+        with ProcessPoolExecutor(options['clients']) as executor:
+            for workers in options['workers']:
+                server = self.start_server(
+                    workers, options['threads'], options['port']
+                )
+                try:
+                    self.load(executor, options, options['warmup'])
+                    latencies, errors = self.load(
+                        executor, options, options['duration']
+                    )
+                finally:
+                    self.stop_server(server)
+                if not latencies:
+                    raise CommandError(
+                        f'Нет успешных запросов к {options["path"]}'
+                    )
+                report['results'][workers] = {
+                    'rps': len(latencies) / options['duration'],
+                    'p50_ms': percentile(latencies, 0.5),
+                    'p95_ms': percentile(latencies, 0.95),
+                    'errors': errors,
+                }
+        baseline = next(iter(report['results'].values()))['rps']
+        for workers, result in report['results'].items():
+            result['speedup'] = result['rps'] / baseline
+            self.stdout.write(
+                f'воркеров: {workers:3d}  {result["rps"]:8.1f} rps  '
+                f'x{result["speedup"]:.2f}  p50 {result["p50_ms"]:.1f} мс  '
+                f'p95 {result["p95_ms"]:.1f} мс  ошибок {result["errors"]}'
+            )
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
@@ -0,0 +1,189 @@
+import gzip
+import json
+import subprocess
+from time import perf_counter
+
+import brotli
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+
+def percentile(values, share):
+    values = sorted(values)
+    index = min(int(round(share * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+DECOMPRESSORS = {
+    'br': brotli.decompress,
+    'gzip': gzip.decompress,
+}
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Замеряет задержку и число запросов ключевых эндпоинтов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--user',
+            help='username пользователя; по умолчанию самый активный'
+        )
+        parser.add_argument('--output', help='файл для JSON-отчета')
+        parser.add_argument(
+            '--accept-encoding', default='br, gzip',
+            help='заголовок Accept-Encoding; пустая строка - без сжатия'
+        )
+        parser.add_argument(
+            '--only', nargs='*', help='имена сценариев для запуска'
+        )
+
+    def get_user(self, username):
+        if username:
+            return User.objects.get(username=username)
+        user = User.objects.filter(
+            shopping_cart__isnull=False, follower__isnull=False
+        ).order_by('id').first()
+        if user is None:
+            raise CommandError(
+                'Нет подходящего пользователя, запустите generate_data'
+            )
+        return user
+
+    def get_scenarios(self, user):
+        recipe = Recipe.objects.order_by('id').first()
+        if recipe is None:
+            raise CommandError('В базе нет рецептов')
+        tags = '&'.join(
+            f'tags={slug}' for slug in
+            Tag.objects.values_list('slug', flat=True)[:2]
+        )
+        ingredient = Ingredient.objects.order_by('id').first()
+        prefix = ingredient.name[:2] if ingredient else 'а'
+        used = list(recipe.amount_ingredient.values_list(
+            'ingredients_id', flat=True
+        )[:2]) or [0]
+        return {
+            'recipes_list': '/api/recipes/',
+            'recipes_list_cards': '/api/recipes/?view=card',
+            'recipes_list_tags': f'/api/recipes/?{tags}',
+            'recipes_list_author': f'/api/recipes/?author={recipe.author_id}',
+            'recipes_list_favorited': '/api/recipes/?is_favorited=1',
+            'recipes_list_in_cart': '/api/recipes/?is_in_shopping_cart=1',
+            'recipes_list_quick': '/api/recipes/?cooking_time_max=30',
+            'recipes_list_ingredients': (
+                f'/api/recipes/?ingredients={used[0]}'
+                f'&exclude_ingredients={used[-1]}'
+            ),
+            'recipes_feed': '/api/recipes/feed/',
+            'recipe_detail': f'/api/recipes/{recipe.id}/',
+            'recipe_similar': f'/api/recipes/{recipe.id}/similar/',
+            'recommendations': '/api/recipes/recommendations/',
+            'subscriptions': '/api/users/subscriptions/?recipes_limit=3',
+            'download_shopping_cart': '/api/recipes/download_shopping_cart/',
+            'ingredients_search': f'/api/ingredients/?name={prefix}',
+            'users_list': '/api/users/',
+            'users_search': f'/api/users/?search={user.username[:5]}',
+        }
+
+    def get_admin_scenarios(self):
+        ingredient = Ingredient.objects.order_by('id').first()
+        prefix = ingredient.name[:3] if ingredient else 'а'
+        return {
+            'admin_recipes': '/admin/recipes/recipe/',
+            'admin_recipes_search': f'/admin/recipes/recipe/?q={prefix}',
+            'admin_users': '/admin/users/user/',
+            'admin_follows': '/admin/users/follow/',
+            'admin_favorites': '/admin/recipes/favorite/',
+            'admin_shopping_carts': '/admin/recipes/shoppingcart/',
+        }
+
+    def run_scenario(self, client, url, repeat):
+        latencies = []
+        queries = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as context:
+                started = perf_counter()
+                response = client.get(url)
+                latencies.append((perf_counter() - started) * 1000)
+            queries.append(len(context))
+        encoding = response.get('Content-Encoding')
+        decompress = DECOMPRESSORS.get(encoding, bytes)
+        return {
+            'url': url,
+            'status': response.status_code,
+            'encoding': encoding,
+            'bytes': len(response.content),
+            'bytes_uncompressed': len(decompress(response.content)),
+            'queries': max(queries),
+            'p50_ms': round(percentile(latencies, 0.5), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+        }
+
+    def handle(self, *args, **options):
+        # Лимиты частоты запросов мешают повторным замерам.
+        with override_settings(REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}
+        }):
+            self.run(options)
+
+    def run(self, options):
+        setup_test_environment()
+        user = self.get_user(options['user'])
+        token, _ = Token.objects.get_or_create(user=user)
+        client = Client(
+            HTTP_AUTHORIZATION=f'Token {token.key}',
+            HTTP_ACCEPT_ENCODING=options['accept_encoding'],
+        )
+        scenarios = {
+            name: (client, url)
+            for name, url in self.get_scenarios(user).items()
+        }
+        admin = User.objects.filter(is_superuser=True).order_by('id').first()
+        if admin is not None:
+            admin_client = Client(
+                HTTP_ACCEPT_ENCODING=options['accept_encoding']
+            )
+            admin_client.force_login(admin)
+            scenarios.update(
+                (name, (admin_client, url))
+                for name, url in self.get_admin_scenarios().items()
+            )
+        if options['only']:
+            scenarios = {
+                name: scenario for name, scenario in scenarios.items()
+                if name in options['only']
+            }
+        report = {
+            'commit': get_commit(),
+            'database': connection.vendor,
+            'user': user.username,
+            'repeat': options['repeat'],
+            'accept_encoding': options['accept_encoding'],
+            'results': {
+                name: self.run_scenario(client, url, options['repeat'])
+                for name, (client, url) in scenarios.items()
+            },
+        }
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        self.stdout.write(output)
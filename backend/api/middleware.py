@@ -0,0 +1,321 @@
+import fcntl
+import heapq
+import json
+import logging
+import os
+import re
+from collections import defaultdict
+from contextlib import contextmanager
+from threading import Lock
+from time import monotonic, perf_counter
+from uuid import uuid4
+
+import brotli
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+logger = logging.getLogger('foodgram.instrumentation')
+
+re_accepts_brotli = re.compile(r'\bbr\b')
+
+METRICS = (
+    ('requests_total', 'Количество запросов'),
+    ('db_queries_total', 'Количество SQL-запросов'),
+    ('db_seconds_total', 'Время выполнения SQL-запросов'),
+    ('app_seconds_total', 'Время работы представления без учета БД'),
+    ('serialize_seconds_total', 'Время работы рендерера ответа'),
+    ('request_seconds_total', 'Полное время обработки запроса'),
+)
+RETIRED_FILE = 'retired.json'
+
+
+def new_stats():
+    return defaultdict(lambda: dict.fromkeys(
+        (metric for metric, _ in METRICS), 0
+    ))
+
+
+def merge_stats(total, data):
+    for view, stats in data.items():
+        for metric, value in stats.items():
+            total[view][metric] += value
+
+
+@contextmanager
+def locked(directory, operation):
+    """
+    Блокировка каталога: retire переносит счетчики под эксклюзивной,
+    snapshot читает файлы под разделяемой, чтобы не сложить счетчики
+    воркера дважды.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'stats.lock'), 'w') as lock:
+        fcntl.flock(lock, operation)
+        yield
+
+
+def read_stats(path):
+    # Файл мог удалить или заменить другой процесс.
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+class EndpointStats:
+    """
+    Накопленная статистика по представлениям.
+
+    Каждый процесс считает свою. Если задан каталог
+    INSTRUMENTATION['STATS_DIR'], процесс записывает в него свои
+    счетчики не чаще раза в flush_interval секунд, а snapshot
+    складывает файлы всех процессов, как multiprocess-режим
+    prometheus_client. Счетчики
+    завершившихся воркеров (gunicorn перезапускает их после
+    max_requests) переносятся в общий файл retired.json, чтобы сумма
+    не уменьшалась. Каталог очищает мастер gunicorn при старте.
+    """
+
+    def __init__(self, directory=None, flush_interval=0):
+        self.lock = Lock()
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.flushed_at = None
+        self.pid = None
+        self.path = None
+        self.data = new_stats()
+
+    def add(self, view, **values):
+        with self.lock:
+            stats = self.data[view]
+            stats['requests_total'] += 1
+            for metric, value in values.items():
+                stats[metric] += value
+            # Первый запрос процесса записывается сразу: по файлу retire
+            # узнает, что процессу есть что переносить.
+            if self.directory and (
+                self.pid != os.getpid()
+                or monotonic() - self.flushed_at >= self.flush_interval
+            ):
+                self.write()
+
+    def get_path(self):
+        # Воркеры gunicorn наследуют объект от мастера, поэтому имя
+        # файла выбирается в самом процессе; uuid не дает новому
+        # воркеру с тем же pid затереть файл завершившегося.
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.path = os.path.join(
+                self.directory, f'{self.pid}-{uuid4().hex}.json'
+            )
+        return self.path
+
+    def write(self):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.get_path()
+        with open(f'{path}.tmp', 'w') as file:
+            json.dump(self.data, file)
+        os.replace(f'{path}.tmp', path)
+        self.flushed_at = monotonic()
+
+    def retire(self):
+        """
+        Переносит счетчики процесса в retired.json и удаляет его файл.
+
+        Вызывается при завершении воркера (хук worker_exit); процесс,
+        который ничего не записал, каталог не трогает.
+        """
+        if not self.directory or self.pid != os.getpid():
+            return
+        retired = os.path.join(self.directory, RETIRED_FILE)
+        with self.lock, locked(self.directory, fcntl.LOCK_EX):
+            total = new_stats()
+            merge_stats(total, read_stats(retired))
+            merge_stats(total, self.data)
+            with open(f'{retired}.tmp', 'w') as file:
+                json.dump(total, file)
+            os.replace(f'{retired}.tmp', retired)
+            os.remove(self.path)
+            self.data.clear()
+
+    def snapshot(self):
+        with self.lock:
+            if not self.directory:
+                return {
+                    view: dict(stats) for view, stats in self.data.items()
+                }
+            self.write()
+        total = new_stats()
+        with locked(self.directory, fcntl.LOCK_SH):
+            for name in os.listdir(self.directory):
+                if name.endswith('.json'):
+                    merge_stats(
+                        total, read_stats(os.path.join(self.directory, name))
+                    )
+        return {view: dict(stats) for view, stats in total.items()}
+
+    def reset(self):
+        with self.lock:
+            self.data.clear()
+
+    def to_prometheus(self):
+        snapshot = self.snapshot()
+        lines = []
+        for metric, description in METRICS:
+            lines.append(f'# HELP foodgram_{metric} {description}')
+            lines.append(f'# TYPE foodgram_{metric} counter')
+            for view, stats in sorted(snapshot.items()):
+                lines.append(
+                    f'foodgram_{metric}{{view="{view}"}} {stats[metric]}'
+                )
+        return '\n'.join(lines) + '\n'
+
+
+endpoint_stats = EndpointStats(
+    getattr(settings, 'INSTRUMENTATION', {}).get('STATS_DIR'),
+    getattr(settings, 'INSTRUMENTATION', {}).get('FLUSH_INTERVAL', 0),
+)
+
+
+class QueryCollector:
+    """
+    Обертка для connection.execute_wrapper, считающая запросы и их время.
+    """
+
+    def __init__(self, keep_slowest=0):
+        self.count = 0
+        self.duration = 0
+        self.keep_slowest = keep_slowest
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - started
+            self.count += 1
+            self.duration += duration
+            if self.keep_slowest:
+                item = (duration, self.count, sql)
+                if len(self.slowest) < self.keep_slowest:
+                    heapq.heappush(self.slowest, item)
+                else:
+                    heapq.heappushpop(self.slowest, item)
+
+
+def get_view_name(request, view_func):
+    """
+    Возвращает имя вида "RecipeViewSet.list" для представления DRF.
+    """
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    method = request.method.lower()
+    actions = getattr(view_func, 'actions', None) or {}
+    return f'{view_class.__name__}.{actions.get(method, method)}'
+
+
+class InstrumentationMiddleware:
+    """
+    Считает SQL-запросы и время обработки по каждому представлению.
+
+    Включается настройкой INSTRUMENTATION['ENABLED']. Время разбивается на
+    работу с БД, работу представления и рендерер ответа и отдается
+    клиенту в заголовке Server-Timing; накопленные значения доступны
+    по /api/metrics/ в текстовом формате Prometheus.
+    """
+
+    def __init__(self, get_response):
+        config = getattr(settings, 'INSTRUMENTATION', {})
+        if not config.get('ENABLED'):
+            raise MiddlewareNotUsed
+        self.keep_slowest = config.get('LOG_SLOWEST_QUERIES', 0)
+        self.get_response = get_response
+
+    def __call__(self, request):
+        collector = QueryCollector(self.keep_slowest)
+        request._instrumentation = {'view': 'unresolved'}
+        started = perf_counter()
+        with connection.execute_wrapper(collector):
+            response = self.get_response(request)
+        total = perf_counter() - started
+        timings = request._instrumentation
+        view_finished = timings.get('view_finished', started + total)
+        view_started = timings.get('view_started', started)
+        serialize = timings.get('serialize', 0)
+        app = max(view_finished - view_started - collector.duration, 0)
+        endpoint_stats.add(
+            timings['view'],
+            db_queries_total=collector.count,
+            db_seconds_total=collector.duration,
+            app_seconds_total=app,
+            serialize_seconds_total=serialize,
+            request_seconds_total=total,
+        )
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={collector.duration * 1000:.1f};'
+            f'desc="{collector.count} queries"',
+            f'app;dur={app * 1000:.1f}',
+            f'serialize;dur={serialize * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+        for duration, _, sql in sorted(collector.slowest, reverse=True):
+            logger.info(
+                '%s %.1fms %s', timings['view'], duration * 1000, sql
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._instrumentation.update(
+            view=get_view_name(request, view_func),
+            view_started=perf_counter(),
+        )
+
+    def process_template_response(self, request, response):
+        # Middleware стоит первым и вызывается последним, поэтому ответ
+        # можно отрендерить здесь и замерить время самого рендерера.
+        view_finished = perf_counter()
+        response.render()
+        request._instrumentation.update(
+            view_finished=view_finished,
+            serialize=perf_counter() - view_finished,
+        )
+        return response
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Сжимает ответы Brotli или gzip, в зависимости от Accept-Encoding.
+
+    Ответы короче COMPRESSION['MIN_LENGTH'] байт не сжимаются.
+    """
+
+    def process_response(self, request, response):
+        if not response.streaming and (
+            len(response.content) < settings.COMPRESSION['MIN_LENGTH']
+        ):
+            return response
+        if response.streaming or response.has_header('Content-Encoding'):
+            return super().process_response(request, response)
+        if not re_accepts_brotli.search(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        ):
+            return super().process_response(request, response)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed_content = brotli.compress(
+            response.content, quality=settings.COMPRESSION['BROTLI_QUALITY']
+        )
+        if len(compressed_content) >= len(response.content):
+            return response
+        response.content = compressed_content
+        response['Content-Length'] = str(len(response.content))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = 'br'
+        return response
@@ -4,3 +4,4 @@ from rest_framework.pagination import PageNumberPagination
 class LimitPageNumberPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+    max_page_size = 100
@@ -6,12 +6,21 @@ from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 
+from events.outbox import record
+from jobs.queue import enqueue
 from recipes.models import (MINIMUM_COOKING_TIME, MINIMUM_OF_INGREDIENTS,
-                            AmountIngredient, Ingredient, Recipe, Tag)
+                            AmountIngredient, Ingredient, Recipe,
+                            ShoppingCart, Tag)
+from recipes.snapshots import refresh_snapshots
+from recipes.tasks import reencode_image
 from users.models import Follow, User
 
 NEED_TAGS_FOR_INGREDIENT = 'Для рецепта нужен минимум 1 тэг'
 NEED_UNIQUE_INGREDIENT = 'В рецепт уже добавлен ингредиент "{value}"'
+MAX_BATCH_SIZE = 100
+MAX_RECIPES_LIMIT = 50
+# Предел PositiveSmallIntegerField: SQLite сам его не проверяет.
+MAX_SERVINGS = 32767
 
 
 class UserSerialiser(DjoserUserSerializer):
@@ -28,12 +37,28 @@ class UserSerialiser(DjoserUserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         return (self.context.get('request').user.is_authenticated
                 and Follow.objects.filter(
                     user=self.context.get('request').user,
                     author=obj).exists())
 
 
+class UserStatsSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор счетчиков активности пользователя.
+    """
+
+    class Meta:
+        model = User
+        fields = (
+            'id', 'recipes_count', 'followers_count', 'following_count',
+            'favorites_count',
+        )
+        read_only_fields = fields
+
+
 class CreateUserSerializer(UserCreateSerializer):
     """
     Сериализатор для создания пользователей.
@@ -185,8 +210,12 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         self.create_ingredients(ingredients, recipe)
+        refresh_snapshots([recipe.id])
+        record('recipe', 'created', recipe_id=recipe.id)
+        enqueue(reencode_image, recipe_id=recipe.id, name=recipe.image.name)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         if 'ingredients' in validated_data:
             ingredients = validated_data.pop('ingredients')
@@ -195,8 +224,16 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         if 'tags' in validated_data:
             instance.tags.set(
                 validated_data.pop('tags'))
-        return super().update(
+        instance = super().update(
             instance, validated_data)
+        refresh_snapshots([instance.id])
+        record('recipe', 'updated', recipe_id=instance.id)
+        if 'image' in validated_data:
+            enqueue(
+                reencode_image, recipe_id=instance.id,
+                name=instance.image.name,
+            )
+        return instance
 
     def to_representation(self, recipe):
         return RecipeSerializer(
@@ -215,6 +252,32 @@ class RecipeForFollowersSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'image', 'cooking_time',)
 
 
+class ShoppingCartServingsSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор количества порций рецепта в корзине.
+    """
+    id = serializers.ReadOnlyField(source='recipe_id')
+
+    class Meta:
+        model = ShoppingCart
+        fields = ('id', 'servings',)
+        extra_kwargs = {'servings': {'max_value': MAX_SERVINGS}}
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """
+    Сериализатор списка id рецептов для пакетных операций.
+    """
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BATCH_SIZE,
+    )
+
+    def validate_recipes(self, value):
+        return list(dict.fromkeys(value))
+
+
 class FollowSerializer(serializers.ModelSerializer):
     """
     Сериализатор подписок пользователей.
@@ -240,13 +303,14 @@ class FollowSerializer(serializers.ModelSerializer):
         return Follow.objects.filter(user=obj.user, author=obj.author).exists()
 
     def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj.author).count()
+        return obj.author.recipes_count
 
     def get_recipes(self, obj):
         request = self.context.get('request')
-        recipes_limit = request.GET.get('recipes_limit')
-        recipes = Recipe.objects.filter(author=obj.author)
-        if recipes_limit:
-            recipes = recipes[:int(recipes_limit)]
+        recipes_limit = request.GET.get('recipes_limit', '')
+        limit = MAX_RECIPES_LIMIT
+        if recipes_limit.isdigit():
+            limit = min(int(recipes_limit), MAX_RECIPES_LIMIT)
+        recipes = Recipe.objects.filter(author=obj.author)[:limit]
         serializer = RecipeForFollowersSerializer(recipes, many=True)
         return serializer.data
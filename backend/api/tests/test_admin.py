@@ -0,0 +1,225 @@
+import base64
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from events.outbox import record
+from jobs.queue import enqueue
+from recipes.archive import archive_recipes
+from recipes.models import (Favorite, FeedEntry, Ingredient, Recipe,
+                            ShoppingCart, Tag)
+from recipes.tasks import purge_deleted_recipes
+from users.models import Follow, User
+
+IMAGE = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwAD'
+    'hgGAWjR9awAAAABJRU5ErkJggg=='
+)
+
+
+@override_settings(
+    JOBS={**settings.JOBS, 'EAGER': False},
+    WEBHOOKS={**settings.WEBHOOKS, 'ENABLED': True},
+)
+class ChangelistQueriesTest(TestCase):
+    """
+    Число запросов списков админки не зависит от числа строк.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='password',
+        )
+        tags = [
+            Tag.objects.create(
+                name=f'Тэг {number}', color=f'#E26C{number:02}',
+                slug=f'tag-{number}',
+            )
+            for number in range(2)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(3)
+        ]
+        users = [
+            User.objects.create_user(
+                username=f'user{number}', email=f'user{number}@example.com',
+                password='password',
+            )
+            for number in range(3)
+        ]
+        for number, user in enumerate(users):
+            recipes = [
+                Recipe.objects.create(
+                    author=user, name=f'Рецепт {number}-{index}',
+                    image='recipe/test.png', text='Описание',
+                    cooking_time=10,
+                )
+                for index in range(2)
+            ]
+            for recipe in recipes:
+                recipe.tags.set(tags)
+                for ingredient in ingredients:
+                    recipe.ingredients.add(
+                        ingredient, through_defaults={'amount': 5}
+                    )
+                record('recipe', 'created', recipe_id=recipe.id)
+            for other in users:
+                Favorite.objects.create(user=other, recipe=recipes[0])
+                ShoppingCart.objects.create(user=other, recipe=recipes[1])
+                if other != user:
+                    Follow.objects.create(user=other, author=user)
+            enqueue(purge_deleted_recipes, key=f'purge:{number}')
+        Recipe.objects.filter(author=users[0]).update(
+            pub_date=timezone.now() - timedelta(days=10)
+        )
+        archive_recipes(timezone.now() - timedelta(days=1))
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def assert_changelist(self, path, queries):
+        # Сессия, пользователь, два COUNT, строки страницы и выборки
+        # значений для list_filter.
+        with self.assertNumQueries(queries):
+            response = self.client.get(f'/admin/{path}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.context['cl'].result_count, 1)
+        return response.context['cl']
+
+    def test_recipes(self):
+        changelist = self.assert_changelist('recipes/recipe', 6)
+        self.assertEqual(sorted(
+            recipe.favorite_count for recipe in changelist.result_list
+        ), [0, 0, 3, 3])
+
+    def test_archived_recipes(self):
+        self.assert_changelist('recipes/archivedrecipe', 5)
+
+    def test_tags(self):
+        self.assert_changelist('recipes/tag', 5)
+
+    def test_ingredients(self):
+        self.assert_changelist('recipes/ingredient', 6)
+
+    def test_favorites(self):
+        self.assert_changelist('recipes/favorite', 5)
+
+    def test_shopping_carts(self):
+        self.assert_changelist('recipes/shoppingcart', 5)
+
+    def test_users(self):
+        self.assert_changelist('users/user', 5)
+
+    def test_follows(self):
+        self.assert_changelist('users/follow', 5)
+
+    def test_jobs(self):
+        self.assert_changelist('jobs/job', 6)
+
+    def test_events(self):
+        self.assert_changelist('events/event', 7)
+
+
+@override_settings(JOBS={**settings.JOBS, 'EAGER': True})
+class RecipeAdminTest(TestCase):
+    """
+    Создание рецепта и смена автора в админке.
+    """
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='password',
+        )
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            password='password',
+        )
+        self.tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+        self.ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+        self.client.force_login(self.admin)
+
+    def get_form(self, author, **extra):
+        return {
+            'author': author.id,
+            'name': 'Рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'tags': [self.tag.id],
+            'amount_ingredient-TOTAL_FORMS': 1,
+            'amount_ingredient-INITIAL_FORMS': 0,
+            'amount_ingredient-0-ingredients': self.ingredient.id,
+            'amount_ingredient-0-amount': 5,
+            **extra,
+        }
+
+    def add_recipe(self):
+        response = self.client.post('/admin/recipes/recipe/add/', {
+            **self.get_form(self.author),
+            'image': SimpleUploadedFile(
+                'recipe.png', IMAGE, content_type='image/png'
+            ),
+        })
+        self.assertEqual(response.status_code, 302)
+        return Recipe.objects.get()
+
+    def change_author(self, recipe, author):
+        form = self.get_form(author, **{
+            'amount_ingredient-INITIAL_FORMS': 1,
+            'amount_ingredient-0-id': recipe.amount_ingredient.get().id,
+            'amount_ingredient-0-recipe': recipe.id,
+        })
+        response = self.client.post(
+            f'/admin/recipes/recipe/{recipe.id}/change/', form
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def get_recipes_count(self, user):
+        user.refresh_from_db()
+        return user.recipes_count
+
+    def test_counters(self):
+        recipe = self.add_recipe()
+        self.assertEqual(self.get_recipes_count(self.author), 1)
+        self.change_author(recipe, self.admin)
+        self.assertEqual(self.get_recipes_count(self.author), 0)
+        self.assertEqual(self.get_recipes_count(self.admin), 1)
+        response = self.client.post(
+            f'/admin/recipes/recipe/{recipe.id}/delete/', {'post': 'yes'}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.get_recipes_count(self.admin), 0)
+
+    def get_feed(self, user):
+        return list(FeedEntry.objects.filter(user=user).values_list(
+            'recipe_id', flat=True
+        ))
+
+    def test_feed(self):
+        follower = User.objects.create_user(
+            username='follower', email='follower@example.com',
+            password='password',
+        )
+        Follow.objects.create(user=follower, author=self.author)
+        recipe = self.add_recipe()
+        self.assertEqual(self.get_feed(follower), [recipe.id])
+        Follow.objects.create(user=self.author, author=self.admin)
+        self.change_author(recipe, self.admin)
+        self.assertEqual(self.get_feed(follower), [])
+        self.assertEqual(self.get_feed(self.author), [recipe.id])
@@ -0,0 +1,152 @@
+import os
+import tarfile
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipes.archive import archive_recipes
+from recipes.models import (AmountIngredient, ArchivedRecipe, Favorite,
+                            Ingredient, Recipe, ShoppingCart, Tag)
+from users.models import User
+
+
+@override_settings(
+    JOBS={**settings.JOBS, 'EAGER': True},
+    REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}},
+)
+class ArchiveTest(TestCase):
+    """
+    Архивация, чтение архивного рецепта, восстановление и выгрузка.
+    """
+
+    def create_user(self, username, **extra):
+        return User.objects.create_user(
+            username=username, email=f'{username}@example.com',
+            password='password', **extra,
+        )
+
+    def get_client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.author = self.create_user('author')
+        self.user = self.create_user('reader')
+        self.tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+        self.ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+        client = self.get_client(self.author)
+        response = client.post('/api/recipes/', {
+            'name': 'Старый рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'tags': [self.tag.id],
+            'ingredients': [{'id': self.ingredient.id, 'amount': 5}],
+            'image': (
+                'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYA'
+                'AAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+            ),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.recipe_id = response.json()['id']
+        client = self.get_client(self.user)
+        for path in ('favorite', 'shopping_cart'):
+            self.assertEqual(client.post(
+                f'/api/recipes/{self.recipe_id}/{path}/'
+            ).status_code, 201)
+        self.assertEqual(client.post(
+            f'/api/users/{self.author.id}/subscribe/'
+        ).status_code, 201)
+        self.expected = client.get(f'/api/recipes/{self.recipe_id}/').json()
+        Recipe.objects.filter(id=self.recipe_id).update(
+            pub_date=timezone.now() - timedelta(days=10)
+        )
+        self.assertEqual(
+            archive_recipes(timezone.now() - timedelta(days=1)), 1
+        )
+
+    def test_archived_recipe_is_read_in_two_queries(self):
+        client = self.get_client(self.user)
+        with self.assertNumQueries(2):
+            response = client.get(f'/api/recipes/{self.recipe_id}/')
+        self.assertEqual(response.json(), self.expected)
+        self.assertFalse(Favorite.objects.exists())
+        self.assertFalse(ShoppingCart.objects.exists())
+
+    def test_restore_action(self):
+        admin = self.create_user('admin', is_staff=True, is_superuser=True)
+        self.client.force_login(admin)
+        response = self.client.post(
+            '/admin/recipes/archivedrecipe/',
+            {'action': 'restore', '_selected_action': [self.recipe_id]},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(ArchivedRecipe.objects.exists())
+        self.assertTrue(Favorite.objects.filter(
+            user=self.user, recipe_id=self.recipe_id
+        ).exists())
+        self.assertTrue(ShoppingCart.objects.filter(
+            user=self.user, recipe_id=self.recipe_id
+        ).exists())
+        self.assertTrue(AmountIngredient.objects.filter(
+            recipe_id=self.recipe_id, ingredients=self.ingredient, amount=5
+        ).exists())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.favorites_count, 1)
+        response = self.get_client(self.user).get(
+            f'/api/recipes/{self.recipe_id}/'
+        )
+        self.assertEqual(response.json(), self.expected)
+
+    def export(self, directory):
+        path = os.path.join(directory, 'recipes.tar')
+        call_command('export_recipes', path, stdout=StringIO())
+        return path
+
+    def test_export_import(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = self.export(directory)
+            with tarfile.open(path) as archive:
+                self.assertEqual(len([
+                    name for name in archive.getnames()
+                    if name.startswith('media/')
+                ]), 1)
+            ArchivedRecipe.objects.all().delete()
+            call_command('import_recipes', path, stdout=StringIO())
+        archived = ArchivedRecipe.objects.get()
+        self.assertGreater(archived.id, self.recipe_id)
+        self.assertEqual(archived.data['id'], archived.id)
+        self.assertEqual(archived.favorited_by, [self.user.id])
+        self.assertEqual(
+            archived.shopping_carts, [{'user_id': self.user.id, 'servings': 1}]
+        )
+        recipe = Recipe.objects.create(
+            author=self.author, name='Новый', image='recipe/test.png',
+            text='Описание', cooking_time=5,
+        )
+        self.assertGreater(recipe.id, archived.id)
+
+    def test_import_stops_on_dropped_users(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = self.export(directory)
+            ArchivedRecipe.objects.all().delete()
+            User.objects.filter(id=self.author.id).update(username='renamed')
+            with self.assertRaisesMessage(CommandError, 'author'):
+                call_command('import_recipes', path, stdout=StringIO())
+        self.assertFalse(ArchivedRecipe.objects.exists())
+        self.assertFalse(User.objects.filter(username='author').exists())
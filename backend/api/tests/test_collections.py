@@ -0,0 +1,187 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+from unittest import skipIf
+
+from django.conf import settings
+from django.db import connection, connections
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.middleware import QueryCollector
+from api.views import BATCH_ADDED, BATCH_ALREADY_ADDED, BATCH_NOT_FOUND
+from jobs.models import Job
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Follow, User
+
+SUCCESS = {'post': 201, 'delete': 204}
+THREADS = 8
+ROUNDS = 5
+# Наибольшее число SQL-запросов на POST и DELETE (с BEGIN в SQLite).
+MAX_QUERIES = {
+    'favorite': {'post': 6, 'delete': 5},
+    'shopping_cart': {'post': 7, 'delete': 6},
+    'subscribe': {'post': 11, 'delete': 8},
+}
+# SQL-запросы пакетного добавления при любом числе рецептов.
+BATCH_QUERIES = {'favorite': 6, 'shopping_cart': 7}
+
+
+@override_settings(REST_FRAMEWORK={
+    **settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}
+})
+class CollectionsConcurrencyTest(TransactionTestCase):
+    """
+    Одновременные добавления и удаления избранного, корзины и подписки.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com', password='password'
+        )
+        author = User.objects.create_user(
+            username='author', email='author@example.com',
+            password='password',
+        )
+        recipe = Recipe.objects.create(
+            author=author, name='Рецепт', image='recipe/test.png',
+            text='Описание', cooking_time=10,
+        )
+        self.token = Token.objects.create(user=self.user).key
+        self.urls = {
+            'favorite': f'/api/recipes/{recipe.id}/favorite/',
+            'shopping_cart': f'/api/recipes/{recipe.id}/shopping_cart/',
+            'subscribe': f'/api/users/{author.id}/subscribe/',
+        }
+
+    def get_client(self):
+        return Client(
+            HTTP_AUTHORIZATION=f'Token {self.token}',
+            raise_request_exception=False,
+        )
+
+    def request(self, client, method, url):
+        collector = QueryCollector()
+        with connection.execute_wrapper(collector):
+            response = getattr(client, method)(url)
+        return method, response.status_code, collector.count
+
+    def hammer(self, url, barrier):
+        """
+        Поток, который в каждом раунде вместе с остальными отправляет
+        POST, а затем DELETE на один и тот же адрес.
+        """
+        client = self.get_client()
+        results = []
+        try:
+            for _ in range(ROUNDS):
+                for method in SUCCESS:
+                    barrier.wait()
+                    results.append(self.request(client, method, url))
+        finally:
+            connections.close_all()
+        return results
+
+    def assert_counters(self):
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.favorites_count, Favorite.objects.filter(
+            user=self.user
+        ).count())
+        self.assertEqual(self.user.following_count, Follow.objects.filter(
+            user=self.user
+        ).count())
+
+    @skipIf(connection.vendor == 'sqlite',
+            'SQLite не допускает одновременных транзакций на запись')
+    def test_concurrent_requests(self):
+        for name, url in self.urls.items():
+            barrier = Barrier(THREADS)
+            with ThreadPoolExecutor(THREADS) as executor:
+                futures = [
+                    executor.submit(self.hammer, url, barrier)
+                    for _ in range(THREADS)
+                ]
+                results = [
+                    row for future in futures for row in future.result()
+                ]
+            for method, success in SUCCESS.items():
+                with self.subTest(name=name, method=method):
+                    statuses = Counter(
+                        status for row_method, status, _ in results
+                        if row_method == method
+                    )
+                    self.assertFalse(
+                        [status for status in statuses if status >= 500],
+                        statuses,
+                    )
+                    self.assertEqual(statuses[success], ROUNDS)
+        self.assertFalse(ShoppingCart.objects.exists())
+        self.assert_counters()
+
+    def test_query_counts(self):
+        client = self.get_client()
+        for name, url in self.urls.items():
+            for method, success in SUCCESS.items():
+                with self.subTest(name=name, method=method):
+                    _, status, queries = self.request(client, method, url)
+                    self.assertEqual(status, success)
+                    self.assertLessEqual(queries, MAX_QUERIES[name][method])
+        self.assert_counters()
+
+
+@override_settings(
+    JOBS={**settings.JOBS, 'EAGER': False},
+    REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}},
+)
+class BatchAddTest(TestCase):
+    """
+    Пакетное добавление в избранное и корзину одним INSERT.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com', password='password'
+        )
+        self.recipe_ids = [
+            Recipe.objects.create(
+                author=self.user, name=f'Рецепт {number}',
+                image='recipe/test.png', text='Описание', cooking_time=10,
+            ).id
+            for number in range(10)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add(self, path, recipe_ids):
+        return self.client.post(
+            f'/api/recipes/{path}/batch/', {'recipes': recipe_ids},
+            format='json',
+        )
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        for path, queries in BATCH_QUERIES.items():
+            for recipe_ids in (self.recipe_ids[:2], self.recipe_ids[2:]):
+                with self.subTest(path=path, size=len(recipe_ids)):
+                    Job.objects.all().delete()
+                    with self.assertNumQueries(queries):
+                        response = self.add(path, recipe_ids)
+                    self.assertEqual(response.status_code, 200)
+
+    def test_statuses(self):
+        self.add('favorite', self.recipe_ids[:2])
+        missing = max(self.recipe_ids) + 1
+        response = self.add(
+            'favorite', [self.recipe_ids[1], missing, self.recipe_ids[2]]
+        )
+        self.assertEqual([
+            result['status'] for result in response.json()['results']
+        ], [BATCH_ALREADY_ADDED, BATCH_NOT_FOUND, BATCH_ADDED])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.favorites_count, 3)
+
+    def test_invalid_id_error(self):
+        response = self.add('favorite', [self.recipe_ids[0], 0])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()['recipes']), ['1'])
@@ -0,0 +1,96 @@
+import gzip
+
+import brotli
+from django.conf import settings
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+
+@override_settings(
+    REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}},
+)
+class CompressionTest(TestCase):
+    """
+    Сжатие ответов API: Brotli, gzip и короткие ответы без сжатия.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='password'
+        )
+        Tag.objects.bulk_create([
+            Tag(
+                name=f'Тэг {number}', color=f'#E26C{number:02}',
+                slug=f'tag-{number}',
+            )
+            for number in range(20)
+        ])
+        Ingredient.objects.bulk_create([
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(50)
+        ])
+        tags = Tag.objects.all()[:3]
+        ingredients = Ingredient.objects.all()[:10]
+        for number in range(6):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {number}',
+                image='recipe/test.png', text='Описание рецепта. ' * 100,
+                cooking_time=10,
+            )
+            recipe.tags.set(tags)
+            for ingredient in ingredients:
+                recipe.ingredients.add(
+                    ingredient, through_defaults={'amount': 5}
+                )
+        cls.recipe_id = recipe.id
+
+    def setUp(self):
+        self.client = APIClient()
+        self.urls = (
+            '/api/recipes/',
+            f'/api/recipes/{self.recipe_id}/',
+            '/api/tags/',
+            '/api/ingredients/',
+        )
+
+    def get(self, url, encoding=None):
+        headers = {'HTTP_ACCEPT_ENCODING': encoding} if encoding else {}
+        response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def assert_compressed(self, encoding, decompress):
+        for url in self.urls:
+            with self.subTest(url=url):
+                plain = self.get(url).content
+                response = self.get(url, f'{encoding}, deflate')
+                self.assertEqual(response['Content-Encoding'], encoding)
+                self.assertIn('Accept-Encoding', response['Vary'])
+                self.assertLess(len(response.content), len(plain))
+                self.assertEqual(
+                    int(response['Content-Length']), len(response.content)
+                )
+                self.assertEqual(decompress(response.content), plain)
+
+    def test_brotli(self):
+        self.assert_compressed('br', brotli.decompress)
+
+    def test_gzip(self):
+        self.assert_compressed('gzip', gzip.decompress)
+
+    def test_plain_without_accept_encoding(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertFalse(self.get(url).has_header('Content-Encoding'))
+
+    def test_short_response_is_not_compressed(self):
+        tag = Tag.objects.first()
+        response = self.get(f'/api/tags/{tag.id}/', 'br, gzip')
+        self.assertLess(
+            len(response.content), settings.COMPRESSION['MIN_LENGTH']
+        )
+        self.assertFalse(response.has_header('Content-Encoding'))
@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe, Tag
+from users.models import User
+
+
+@override_settings(
+    JOBS={**settings.JOBS, 'EAGER': False},
+    REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}},
+)
+class RecipeListETagTest(TestCase):
+    """
+    ETag списка рецептов по странице и его сброс при правке тэга.
+    """
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='password',
+        )
+        self.tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+        for number in range(3):
+            recipe = Recipe.objects.create(
+                author=self.admin, name=f'Рецепт {number}',
+                image='recipe/test.png', text='Описание', cooking_time=10,
+            )
+            recipe.tags.set([self.tag])
+        self.client = APIClient()
+
+    def get_list(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get('/api/recipes/', {'limit': 2}, **headers)
+
+    def test_not_modified_reads_only_the_page(self):
+        etag = self.get_list()['ETag']
+        # COUNT для пагинатора и срез id страницы.
+        with self.assertNumQueries(2):
+            self.assertEqual(self.get_list(etag).status_code, 304)
+
+    def test_tag_edit_changes_etag_before_jobs_run(self):
+        etag = self.get_list()['ETag']
+        self.client.force_login(self.admin)
+        response = self.client.post(
+            f'/admin/recipes/tag/{self.tag.id}/change/',
+            {'name': 'Обед', 'color': '#E26C2D', 'slug': 'breakfast'},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.client.logout()
+        response = self.get_list(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['results'][0]['tags'][0]['name'], 'Обед'
+        )
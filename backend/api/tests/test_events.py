@@ -0,0 +1,105 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from events.models import Event
+from events.outbox import dispatch, record
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        server = self.server
+        server.requests.append(json.loads(body))
+        reply = server.replies.pop(0) if server.replies else 200
+        if reply == 'garbage':
+            # Ответ без строки статуса HTTP: BadStatusLine у клиента.
+            self.wfile.write(b'garbage\r\n\r\n')
+            return
+        self.send_response(reply)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class DispatchTest(TestCase):
+    """
+    Доставка событий на вебхук: пачки, схлопывание, повторы.
+    """
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), WebhookHandler)
+        self.server.requests = []
+        self.server.replies = []
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        webhooks = override_settings(WEBHOOKS={
+            **settings.WEBHOOKS,
+            'ENABLED': True,
+            'URLS': [f'http://127.0.0.1:{self.server.server_port}/'],
+            'MAX_ATTEMPTS': 3,
+        })
+        webhooks.enable()
+        self.addCleanup(webhooks.disable)
+
+    def make_available(self):
+        Event.objects.update(available_at=timezone.now())
+
+    def test_batches_and_coalesces(self):
+        record('recipe', 'created', recipe_id=1)
+        record('recipe', 'updated', recipe_id=1)
+        record('recipe', 'updated', recipe_id=2)
+        self.assertEqual(dispatch(100), 3)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual([
+            (event['action'], event['payload'])
+            for event in self.server.requests[0]['events']
+        ], [('updated', {'recipe_id': 1}), ('updated', {'recipe_id': 2})])
+        self.assertFalse(Event.objects.exists())
+
+    def test_retries_failed_batch(self):
+        self.server.replies = [500, 'garbage']
+        record('recipe', 'updated', recipe_id=1)
+        with self.assertLogs('foodgram.events', 'WARNING'):
+            self.assertEqual(dispatch(100), 0)
+        event = Event.objects.get()
+        self.assertEqual(event.attempts, 1)
+        self.assertGreater(event.available_at, timezone.now())
+        self.assertEqual(dispatch(100), 0)
+        self.make_available()
+        with self.assertLogs('foodgram.events', 'WARNING'):
+            self.assertEqual(dispatch(100), 0)
+        self.assertEqual(Event.objects.get().attempts, 2)
+        self.make_available()
+        self.assertEqual(dispatch(100), 1)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_stops_after_max_attempts(self):
+        self.server.replies = [500] * 3
+        record('recipe', 'updated', recipe_id=1)
+        with self.assertLogs('foodgram.events', 'WARNING') as logs:
+            for _ in range(3):
+                self.make_available()
+                self.assertEqual(dispatch(100), 0)
+        self.assertIn('не доставлены за 3 попыток', logs.output[-1])
+        event = Event.objects.get()
+        self.assertIsNotNone(event.failed_at)
+        self.make_available()
+        self.assertEqual(dispatch(100), 0)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_disabled_records_nothing(self):
+        with override_settings(
+            WEBHOOKS={**settings.WEBHOOKS, 'ENABLED': False}
+        ):
+            record('recipe', 'updated', recipe_id=1)
+        self.assertFalse(Event.objects.exists())
@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipes.feed import fan_out_recipe
+from recipes.models import FeedEntry, Recipe
+from users.models import User
+
+
+@override_settings(
+    FEED_FANOUT_LIMIT=1,
+    JOBS={**settings.JOBS, 'EAGER': True},
+    REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}},
+)
+class FeedTest(TestCase):
+    """
+    Лента из предрассчитанных записей и рецептов популярных авторов.
+    """
+
+    def create_user(self, username):
+        return User.objects.create_user(
+            username=username, email=f'{username}@example.com',
+            password='password',
+        )
+
+    def get_client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def create_recipes(self, author, count, start):
+        recipes = []
+        for number in range(count):
+            recipe = Recipe.objects.create(
+                author=author, name=f'{author.username} {number}',
+                image='recipe/test.png', text='Описание', cooking_time=10,
+            )
+            Recipe.objects.filter(id=recipe.id).update(
+                pub_date=start + timedelta(hours=number * 2)
+            )
+            fan_out_recipe(recipe.id)
+            recipes.append(recipe.id)
+        return recipes
+
+    def setUp(self):
+        self.user = self.create_user('reader')
+        self.other = self.create_user('other')
+        self.author = self.create_user('author')
+        self.popular = self.create_user('popular')
+        for user, author in (
+            (self.user, self.author), (self.user, self.popular),
+            (self.other, self.popular),
+        ):
+            self.assertEqual(self.get_client(user).post(
+                f'/api/users/{author.id}/subscribe/'
+            ).status_code, 201)
+        start = timezone.now() - timedelta(days=1)
+        self.recipes = self.create_recipes(self.author, 3, start)
+        self.popular_recipes = self.create_recipes(
+            self.popular, 3, start + timedelta(hours=1)
+        )
+
+    def get_feed(self, **params):
+        response = self.get_client(self.user).get(
+            '/api/recipes/feed/', params
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_merges_timeline_and_popular_authors(self):
+        self.assertFalse(FeedEntry.objects.filter(
+            recipe_id__in=self.popular_recipes
+        ).exists())
+        expected = [
+            recipe_id for pair in zip(self.recipes, self.popular_recipes)
+            for recipe_id in pair
+        ][::-1]
+        data = self.get_feed(limit=4)
+        self.assertEqual(data['count'], 6)
+        self.assertEqual(
+            [recipe['id'] for recipe in data['results']], expected[:4]
+        )
+        data = self.get_feed(limit=4, page=2)
+        self.assertEqual(
+            [recipe['id'] for recipe in data['results']], expected[4:]
+        )
+
+    def test_author_leaving_popular_is_fanned_out(self):
+        self.assertEqual(self.get_client(self.other).delete(
+            f'/api/users/{self.popular.id}/subscribe/'
+        ).status_code, 204)
+        self.assertEqual(set(FeedEntry.objects.filter(
+            user=self.user, recipe__author=self.popular
+        ).values_list('recipe_id', flat=True)), set(self.popular_recipes))
+        self.assertEqual(self.get_feed()['count'], 6)
@@ -0,0 +1,118 @@
+from django.conf import settings
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart
+from users.models import User
+
+
+@override_settings(
+    REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}},
+)
+class RecipeFilterTest(TestCase):
+    """
+    Фильтры списка рецептов.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='user', email='user@example.com', password='password'
+        )
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(3)
+        ]
+        first, second, third = cls.ingredients
+        cls.recipes = []
+        for cooking_time, ingredients in (
+            (10, (first, second)), (20, (first,)), (30, (third,)),
+        ):
+            recipe = Recipe.objects.create(
+                author=cls.user, name=f'Рецепт {cooking_time}',
+                image='recipe/test.png', text='Описание',
+                cooking_time=cooking_time,
+            )
+            for ingredient in ingredients:
+                recipe.ingredients.add(
+                    ingredient, through_defaults={'amount': 5}
+                )
+            cls.recipes.append(recipe)
+        Favorite.objects.create(user=cls.user, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipes[1])
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get_ids(self, **params):
+        response = self.client.get('/api/recipes/', params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(recipe['id'] for recipe in response.json()['results'])
+
+    def get_recipe_ids(self, *indexes):
+        return sorted(self.recipes[index].id for index in indexes)
+
+    def test_flags(self):
+        self.client.force_authenticate(self.user)
+        for name, index in (('is_favorited', 0), ('is_in_shopping_cart', 1)):
+            others = {0, 1, 2} - {index}
+            for value, expected in (
+                ('1', [index]), ('true', [index]),
+                ('0', others), ('false', others),
+            ):
+                with self.subTest(name=name, value=value):
+                    self.assertEqual(
+                        self.get_ids(**{name: value}),
+                        self.get_recipe_ids(*expected),
+                    )
+
+    def test_flags_for_anonymous(self):
+        for name in ('is_favorited', 'is_in_shopping_cart'):
+            with self.subTest(name=name):
+                self.assertEqual(self.get_ids(**{name: 1}), [])
+                self.assertEqual(
+                    self.get_ids(**{name: 0}), self.get_recipe_ids(0, 1, 2)
+                )
+
+    def get_ingredient_ids(self, *indexes):
+        return ','.join(str(self.ingredients[index].id) for index in indexes)
+
+    def test_ingredients(self):
+        for params, expected in (
+            ({'ingredients': self.get_ingredient_ids(0)}, (0, 1)),
+            ({'ingredients': self.get_ingredient_ids(0, 1)}, (0,)),
+            ({'exclude_ingredients': self.get_ingredient_ids(1)}, (1, 2)),
+            ({'exclude_ingredients': self.get_ingredient_ids(1, 2)}, (1,)),
+            ({
+                'ingredients': self.get_ingredient_ids(0),
+                'exclude_ingredients': self.get_ingredient_ids(1),
+            }, (1,)),
+            ({
+                'ingredients': self.get_ingredient_ids(0),
+                'exclude_ingredients': self.get_ingredient_ids(0),
+            }, ()),
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(
+                    self.get_ids(**params), self.get_recipe_ids(*expected)
+                )
+
+    def test_cooking_time_range(self):
+        for params, expected in (
+            ({'cooking_time_min': 20}, (1, 2)),
+            ({'cooking_time_max': 20}, (0, 1)),
+            ({'cooking_time_min': 10, 'cooking_time_max': 10}, (0,)),
+            ({'cooking_time_min': 15, 'cooking_time_max': 25}, (1,)),
+            ({'cooking_time_min': 31}, ()),
+            ({'cooking_time_max': 9}, ()),
+            ({
+                'cooking_time_max': 20,
+                'exclude_ingredients': self.get_ingredient_ids(1),
+            }, (1,)),
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(
+                    self.get_ids(**params), self.get_recipe_ids(*expected)
+                )
@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from jobs.management.commands import run_worker
+from jobs.models import Job
+from jobs.queue import enqueue
+from recipes.tasks import purge_deleted_recipes
+
+
+@override_settings(JOBS={**settings.JOBS, 'EAGER': False})
+class WorkerTest(TransactionTestCase):
+    """
+    Воркер переживает аварийное завершение дочернего процесса.
+    """
+
+    def setUp(self):
+        self.calls = 0
+        pool = mock.patch.object(
+            run_worker, 'ProcessPoolExecutor', ThreadPoolExecutor
+        )
+        run = mock.patch.object(run_worker, 'run', self.crash_once)
+        for patcher in (pool, run):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def crash_once(self, job_id):
+        self.calls += 1
+        if self.calls == 1:
+            raise BrokenProcessPool
+        return run_worker.execute(job_id)
+
+    def work(self):
+        call_command(
+            'run_worker', '--once', '--processes', '1', '--interval', '0',
+            stdout=StringIO(),
+        )
+
+    def test_broken_pool_is_recreated(self):
+        enqueue(purge_deleted_recipes, key='first')
+        enqueue(purge_deleted_recipes, key='second')
+        with self.assertLogs('foodgram.jobs', 'ERROR'):
+            self.work()
+        # Задача упавшего процесса ждет конца времени видимости, а
+        # вторая выполнена в новом пуле.
+        self.assertEqual(
+            sorted(Job.objects.values_list('status', flat=True)),
+            sorted([Job.RUNNING, Job.DONE]),
+        )
+        Job.objects.filter(status=Job.RUNNING).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        self.work()
+        self.assertFalse(Job.objects.exclude(status=Job.DONE).exists())
@@ -0,0 +1,126 @@
+import os
+import re
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.middleware import EndpointStats, endpoint_stats
+from recipes.models import Tag
+from users.models import User
+
+
+class EndpointStatsTest(SimpleTestCase):
+    """
+    Метрики нескольких процессов, сложенные через общий каталог.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_sums_workers_and_keeps_retired(self):
+        first = EndpointStats(self.directory)
+        second = EndpointStats(self.directory)
+        first.add('RecipeViewSet.list', db_queries_total=3)
+        second.add('RecipeViewSet.list', db_queries_total=2)
+        second.add('RecipeViewSet.retrieve', db_queries_total=1)
+        stats = first.snapshot()
+        self.assertEqual(stats['RecipeViewSet.list']['requests_total'], 2)
+        self.assertEqual(stats['RecipeViewSet.list']['db_queries_total'], 5)
+        second.retire()
+        self.assertEqual(len([
+            name for name in os.listdir(self.directory)
+            if name.endswith('.json')
+        ]), 2)
+        self.assertEqual(first.snapshot(), stats)
+        first.add('RecipeViewSet.retrieve', db_queries_total=1)
+        first.retire()
+        stats = EndpointStats(self.directory).snapshot()
+        self.assertEqual(stats['RecipeViewSet.retrieve']['requests_total'], 2)
+        self.assertEqual(stats['RecipeViewSet.list']['requests_total'], 2)
+
+    def test_flush_interval(self):
+        first = EndpointStats(self.directory, flush_interval=60)
+        reader = EndpointStats(self.directory)
+        first.add('RecipeViewSet.list', db_queries_total=1)
+        first.add('RecipeViewSet.list', db_queries_total=1)
+        # Второй запрос еще не записан, но при завершении не теряется.
+        stats = reader.snapshot()
+        self.assertEqual(stats['RecipeViewSet.list']['requests_total'], 1)
+        first.retire()
+        stats = reader.snapshot()
+        self.assertEqual(stats['RecipeViewSet.list']['requests_total'], 2)
+
+    def test_without_directory_stats_are_local(self):
+        stats = EndpointStats()
+        stats.add('RecipeViewSet.list', db_queries_total=3)
+        stats.retire()
+        self.assertEqual(
+            stats.snapshot()['RecipeViewSet.list']['db_queries_total'], 3
+        )
+
+
+@override_settings(
+    INSTRUMENTATION={**settings.INSTRUMENTATION, 'ENABLED': True},
+    REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}},
+)
+class InstrumentationTest(TestCase):
+    """
+    Заголовок Server-Timing, счетчики запросов и /api/metrics/.
+    """
+
+    def setUp(self):
+        endpoint_stats.reset()
+        self.addCleanup(endpoint_stats.reset)
+        Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+
+    def test_server_timing(self):
+        response = self.client.get('/api/tags/')
+        timing = dict(
+            part.split(';', 1)
+            for part in response['Server-Timing'].split(', ')
+        )
+        self.assertEqual(
+            set(timing), {'db', 'app', 'serialize', 'total'}
+        )
+        self.assertRegex(timing['db'], r'^dur=[\d.]+;desc="1 queries"$')
+
+    def test_query_counts(self):
+        for _ in range(2):
+            self.client.get('/api/tags/')
+        stats = endpoint_stats.snapshot()['TagViewSet.list']
+        self.assertEqual(stats['requests_total'], 2)
+        self.assertEqual(stats['db_queries_total'], 2)
+        self.assertGreater(stats['request_seconds_total'], 0)
+
+    def test_metrics_merge_processes(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='password',
+        )
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.client.get('/api/tags/')
+        other = EndpointStats(directory.name)
+        other.add('TagViewSet.list', db_queries_total=3)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        with mock.patch.multiple(
+            endpoint_stats, directory=directory.name, pid=None, path=None
+        ):
+            self.client.get('/api/tags/')
+            response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        metrics = dict(re.findall(
+            r'^(foodgram_\w+)\{view="TagViewSet.list"\} (\S+)$',
+            response.content.decode(), re.M,
+        ))
+        # Два запроса этого процесса и один - другого.
+        self.assertEqual(metrics['foodgram_requests_total'], '3')
+        self.assertEqual(metrics['foodgram_db_queries_total'], '5')
+
+    def test_metrics_require_admin(self):
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 401)
@@ -0,0 +1,119 @@
+from django.conf import settings
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.serializers import MAX_SERVINGS
+from jobs.models import Job
+from recipes.models import Ingredient, Recipe, ShoppingCart, ShoppingCartExport
+from users.models import User
+
+# Наибольшее значение PositiveSmallIntegerField.
+MAX_AMOUNT = 32767
+
+
+@override_settings(
+    JOBS={**settings.JOBS, 'EAGER': True},
+    REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}},
+)
+class ShoppingCartTest(TestCase):
+    """
+    Список покупок на границах количества ингредиента и числа порций.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com', password='password'
+        )
+        ingredient = Ingredient.objects.create(
+            name='Мука', measurement_unit='кг'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.user, name='Рецепт', image='recipe/test.png',
+            text='Описание', cooking_time=10,
+        )
+        self.recipe.ingredients.add(
+            ingredient, through_defaults={'amount': MAX_AMOUNT}
+        )
+        ShoppingCart.objects.create(
+            user=self.user, recipe=self.recipe, servings=MAX_AMOUNT
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self):
+        response = self.client.get('/api/recipes/download_shopping_cart/')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_max_amount_and_servings(self):
+        # 32767 кг * 32767 порций = 1,07e12 г, больше предела integer.
+        self.assertIn(
+            f'- Мука - {MAX_AMOUNT * MAX_AMOUNT} кг\n', self.download()
+        )
+
+    def test_servings_bounds(self):
+        url = f'/api/recipes/{self.recipe.id}/shopping_cart/'
+        for servings in (0, MAX_SERVINGS + 1):
+            with self.subTest(servings=servings):
+                response = self.client.patch(
+                    url, {'servings': servings}, format='json'
+                )
+                self.assertEqual(response.status_code, 400)
+        response = self.client.patch(url, {'servings': 1}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.patch(
+            url, {'servings': MAX_SERVINGS}, format='json'
+        )
+        self.assertEqual(response.json()['servings'], MAX_SERVINGS)
+        self.assertIn(
+            f'- Мука - {MAX_AMOUNT * MAX_SERVINGS} кг\n', self.download()
+        )
+
+
+@override_settings(
+    JOBS={**settings.JOBS, 'EAGER': False},
+    REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}},
+)
+class ShoppingCartExportTest(TestCase):
+    """
+    Сборка списка покупок: одна задача на корзину, скачивание без задач.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com', password='password'
+        )
+        self.recipe_ids = [
+            Recipe.objects.create(
+                author=self.user, name=f'Рецепт {number}',
+                image='recipe/test.png', text='Описание', cooking_time=10,
+            ).id
+            for number in range(2)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_one_pending_export_per_user(self):
+        for recipe_id in self.recipe_ids:
+            response = self.client.post(
+                f'/api/recipes/{recipe_id}/shopping_cart/'
+            )
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(Job.objects.count(), 1)
+        Job.objects.update(status=Job.DONE)
+        self.client.delete(
+            f'/api/recipes/{self.recipe_ids[0]}/shopping_cart/'
+        )
+        self.assertEqual(Job.objects.filter(status=Job.PENDING).count(), 1)
+
+    def test_download_stores_text_without_job(self):
+        ShoppingCart.objects.create(
+            user=self.user, recipe_id=self.recipe_ids[0]
+        )
+        response = self.client.get('/api/recipes/download_shopping_cart/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(
+            ShoppingCartExport.objects.get(user=self.user).text,
+            response.content.decode(),
+        )
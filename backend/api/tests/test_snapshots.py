@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from recipes.models import Ingredient, Recipe, RecipeSnapshot, Tag
+from recipes.snapshots import refresh_snapshots
+from users.models import User
+
+
+@override_settings(JOBS={**settings.JOBS, 'EAGER': True})
+class RelatedDeleteTest(TestCase):
+    """
+    Удаление тэга или ингредиента в админке пересобирает снимки.
+    """
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='password',
+        )
+        self.tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+        self.ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.admin, name='Рецепт', image='recipe/test.png',
+            text='Описание', cooking_time=10,
+        )
+        self.recipe.tags.set([self.tag])
+        self.recipe.ingredients.add(
+            self.ingredient, through_defaults={'amount': 5}
+        )
+        refresh_snapshots([self.recipe.id])
+        self.updated_at = Recipe.objects.get(id=self.recipe.id).updated_at
+        self.client.force_login(self.admin)
+
+    def get_snapshot(self):
+        return RecipeSnapshot.objects.get(recipe_id=self.recipe.id).data
+
+    def assert_touched(self):
+        self.assertGreater(
+            Recipe.objects.get(id=self.recipe.id).updated_at, self.updated_at
+        )
+
+    def test_tag_delete(self):
+        self.assertEqual(len(self.get_snapshot()['tags']), 1)
+        response = self.client.post(
+            f'/admin/recipes/tag/{self.tag.id}/delete/', {'post': 'yes'}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.get_snapshot()['tags'], [])
+        self.assert_touched()
+
+    def test_ingredient_delete_action(self):
+        self.assertEqual(len(self.get_snapshot()['ingredients']), 1)
+        response = self.client.post('/admin/recipes/ingredient/', {
+            'action': 'delete_selected',
+            '_selected_action': [self.ingredient.id],
+            'post': 'yes',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.get_snapshot()['ingredients'], [])
+        self.assert_touched()
@@ -0,0 +1,69 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from api.throttles import AnonTokenBucketThrottle
+from recipes.models import Tag
+
+THREADS = 8
+
+
+@override_settings(REST_FRAMEWORK={
+    **settings.REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {'anon': '3/min', 'user': '3/min'},
+})
+class TokenBucketTest(TestCase):
+    """
+    Ведро токенов: лимит, стоимость действий, одновременные запросы.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+
+    def test_limit_and_retry_after(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get('/api/tags/').status_code, 200)
+        response = self.client.get('/api/tags/')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn(int(response['Retry-After']), (19, 20))
+
+    def test_denied_request_costs_nothing(self):
+        for _ in range(3):
+            self.client.get('/api/tags/')
+        for _ in range(3):
+            response = self.client.get('/api/tags/')
+        self.assertIn(int(response['Retry-After']), (19, 20))
+
+    def test_action_cost(self):
+        # Список ингредиентов стоит 2 токена из 3.
+        self.assertEqual(
+            self.client.get('/api/ingredients/').status_code, 200
+        )
+        self.assertEqual(
+            self.client.get('/api/ingredients/').status_code, 429
+        )
+        self.assertEqual(self.client.get('/api/tags/').status_code, 200)
+
+    def test_no_database_queries(self):
+        # Только выборка тэгов: ведро живет в кэше, а не в БД.
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/tags/').status_code, 200)
+
+    def test_concurrent_requests(self):
+        request = SimpleNamespace(
+            user=AnonymousUser(), META={'REMOTE_ADDR': '192.0.2.1'}
+        )
+        view = SimpleNamespace(action='list')
+
+        def allow(_):
+            return AnonTokenBucketThrottle().allow_request(request, view)
+
+        with ThreadPoolExecutor(THREADS) as executor:
+            allowed = list(executor.map(allow, range(THREADS * 4)))
+        self.assertEqual(allowed.count(True), 3)
@@ -0,0 +1,99 @@
+from contextlib import suppress
+from time import time
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Ограничение частоты запросов по алгоритму token bucket.
+
+    Ведро вмещает столько токенов, сколько запросов разрешает ставка
+    (например, '120/min'), и равномерно пополняется. Запрос списывает
+    стоимость действия из throttle_costs представления, поэтому тяжелые
+    эндпоинты расходуют лимит быстрее.
+
+    Ведро хранится в кэше одним числом (GCRA): моментом в миллисекундах,
+    когда оно снова наполнится. Запрос сдвигает его атомарным cache.incr
+    на стоимость, так что одновременные запросы клиента не требуют
+    блокировки. Ключ не истекает: вытеснение из кэша лишь наполняет ведро.
+    """
+    cost = 1
+
+    def get_rate(self):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def get_cost(self, request, view):
+        action = getattr(view, 'action', None) or request.method.lower()
+        return getattr(view, 'throttle_costs', {}).get(action, 1)
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        self.cost = min(self.get_cost(request, view), self.num_requests)
+        # Время пополнения стоимости запроса и всего ведра, мс.
+        step = max(1, round(
+            self.cost * self.duration * 1000 / self.num_requests
+        ))
+        capacity = self.duration * 1000
+        now = round(time() * 1000)
+        full_at = self.spend(step, now)
+        if full_at is None:
+            return True
+        self.excess = full_at - now - capacity
+        if self.excess > 0:
+            # Отказ не тратит токены.
+            with suppress(ValueError):
+                self.cache.incr(self.key, -step)
+            return False
+        return True
+
+    def spend(self, step, now):
+        """
+        Сдвигает момент наполнения ведра на step и возвращает его.
+
+        Если ведро уже полное, отсчет начинается с текущего момента.
+        None означает, что ключ вытеснили прямо во время запроса.
+        """
+        try:
+            full_at = self.cache.incr(self.key, step)
+        except ValueError:
+            if self.cache.add(self.key, now + step, None):
+                return now + step
+            try:
+                full_at = self.cache.incr(self.key, step)
+            except ValueError:
+                return None
+        if full_at - step < now:
+            full_at = now + step
+            self.cache.set(self.key, full_at, None)
+        return full_at
+
+    def wait(self):
+        return self.excess / 1000
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        if not request.user.is_authenticated:
+            return None
+        return self.cache_format % {
+            'scope': self.scope, 'ident': request.user.pk
+        }
+
+
+class AnonTokenBucketThrottle(TokenBucketThrottle):
+    scope = 'anon'
+
+    def get_cache_key(self, request, view):
+        if request.user.is_authenticated:
+            return None
+        return self.cache_format % {
+            'scope': self.scope, 'ident': self.get_ident(request)
+        }
@@ -1,7 +1,7 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (FollowUnfollow, IngredientViewSet,
+from .views import (FollowUnfollow, IngredientViewSet, MetricsView,
                     RecipeViewSet, TagViewSet, UsersViewSet,
                     SubscriptionsList)
 
@@ -21,6 +21,7 @@ urlpatterns = [
     ),
     path('users/subscriptions/',
          SubscriptionsList.as_view(), name='subscriptions'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('', include(router_v1.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
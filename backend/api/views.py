@@ -1,45 +1,123 @@
+from hashlib import md5
 from http import HTTPStatus
 
-from django.db.models import Sum, Exists, OuterRef
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
 from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import filters, generics, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.generics import get_object_or_404
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from .filters import IngredientFilter, RecipeFilter
+from .middleware import endpoint_stats
 from .permissions import IsAuthorOrReadOnly, IsAdminOrReadOnly
 from .serializers import (FollowSerializer, IngredientSerializer,
                           UserSerialiser, RecipeCreateSerializer,
-                          RecipeForFollowersSerializer, RecipeSerializer,
-                          TagSerializer)
-from recipes.models import (AmountIngredient, Favorite, Ingredient,
-                            Recipe, ShoppingCart, Tag)
+                          RecipeForFollowersSerializer, RecipeIdsSerializer,
+                          RecipeSerializer, ShoppingCartServingsSerializer,
+                          TagSerializer, UserStatsSerializer)
+from events.outbox import record, record_many
+from foodgram.db import insert_ignore, insert_ignore_many
+from jobs.queue import enqueue, is_pending
+from recipes.archive import get_archived, soft_delete
+from recipes.carts import (get_cart_version, get_shopping_cart_text,
+                           render_shopping_cart, save_shopping_cart_text)
+from recipes.feed import get_feed, is_leaving_popular, remove_from_feed
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.representations import (CARD_FIELDS, RECIPE_FIELDS,
+                                     get_recipes_data, get_value_fields)
+from recipes.snapshots import get_snapshot, render_snapshot, touch_recipes
+from recipes.tasks import (backfill_feed, export_shopping_cart,
+                           fan_out_author, fan_out_recipe,
+                           purge_deleted_recipes, refresh_related_snapshots)
+from users.counters import change_counter, change_follow_counters
 from users.models import Follow, User
 
 NOT_SELF_SUBSCRIBE = 'На себя подписаться нельзя'
 DOUBLE_SUBSCRIBE = 'Вы уже подписаны на этого автора'
 NOT_SUBSCRIBED = 'Вы не подписаны на автора и отписка от него невозможна'
+UNKNOWN_FIELDS = 'Неизвестные поля: {}'
+BATCH_ADDED = 'added'
+BATCH_ALREADY_ADDED = 'already_added'
+BATCH_NOT_FOUND = 'not_found'
+BATCH_DELETED = 'deleted'
+BATCH_NOT_ADDED = 'not_added'
+
+
+def change_favorites_count(model, user, delta):
+    if model is Favorite:
+        change_counter('favorites_count', [user.id], delta)
+
+
+def export_cart(model, user):
+    """
+    Ставит сборку списка покупок после изменения корзины.
+
+    Еще не начатая задача соберет список по корзине на момент запуска,
+    поэтому вторая такая же не ставится.
+    """
+    if model is ShoppingCart and not is_pending(
+        export_shopping_cart, user_id=user.id
+    ):
+        enqueue(export_shopping_cart, user_id=user.id)
+
+
+def bump_collections_version(user):
+    """
+    Сбрасывает ETag рецептов пользователя после изменения избранного,
+    корзины или подписок.
+    """
+    User.objects.filter(id=user.id).update(
+        collections_version=F('collections_version') + 1
+    )
 
 
 class UsersViewSet(UserViewSet):
     """
     Вьюсет для пользователей.
     """
-    queryset = User.objects.all()
+    queryset = User.objects.order_by('id')
     serializer_class = UserSerialiser
     filter_backends = (DjangoFilterBackend, filters.SearchFilter,)
-    search_fields = ('username', 'email')
+    search_fields = ('^username', '^email')
     permission_classes = [IsAuthorOrReadOnly | IsAdminOrReadOnly]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_authenticated:
+            return queryset.annotate(is_subscribed=Exists(
+                Follow.objects.filter(user=user, author=OuterRef('pk'))
+            ))
+        return queryset
+
     def get_permissions(self):
-        if self.action in ['retrieve', 'me']:
+        if self.action in ['retrieve', 'me', 'stats']:
             self.permission_classes = [IsAuthenticated]
         return super().get_permissions()
 
+    @action(detail=True, methods=['GET'])
+    def stats(self, request, id=None):
+        """
+        Счетчики для шапки профиля без агрегирующих запросов.
+        """
+        user = get_object_or_404(
+            User.objects.only(*UserStatsSerializer.Meta.fields), id=id
+        )
+        return Response(UserStatsSerializer(user).data)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        touch_recipes(author_id=serializer.instance.id)
+        enqueue(refresh_related_snapshots, author_id=serializer.instance.id)
+
 
 class FollowUnfollow(generics.RetrieveDestroyAPIView,
                      generics.ListCreateAPIView):
@@ -62,22 +140,31 @@ class FollowUnfollow(generics.RetrieveDestroyAPIView,
         if request.user.id == instance.id:
             return Response({'errors': NOT_SELF_SUBSCRIBE},
                             status=status.HTTP_400_BAD_REQUEST)
-        subscription, created = request.user.follower.get_or_create(
-            author=instance
-        )
-        if not created:
-            return Response({'errors': DOUBLE_SUBSCRIBE},
-                            status=status.HTTP_400_BAD_REQUEST)
+        subscription = Follow(user=request.user, author=instance)
+        with transaction.atomic():
+            if not insert_ignore(subscription):
+                return Response({'errors': DOUBLE_SUBSCRIBE},
+                                status=status.HTTP_400_BAD_REQUEST)
+            change_follow_counters(request.user.id, instance.id, 1)
+        enqueue(backfill_feed, user_id=request.user.id, author_id=instance.id)
+        bump_collections_version(request.user)
         serializer = self.get_serializer(subscription)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @transaction.atomic
     def delete(self, request, *args, **kwargs):
-        instance = self.get_object()
+        author_id = self.kwargs['user_id']
         subscription, _ = Follow.objects.filter(
-            user=request.user, author=instance
+            user=request.user, author_id=author_id
         ).delete()
         if subscription:
+            change_follow_counters(request.user.id, author_id, -1)
+            remove_from_feed(request.user.id, author_id)
+            if is_leaving_popular(author_id):
+                enqueue(fan_out_author, author_id=int(author_id))
+            bump_collections_version(request.user)
             return Response(status=status.HTTP_204_NO_CONTENT)
+        self.get_object()
         return Response(
             {'errors': NOT_SUBSCRIBED}, status=status.HTTP_400_BAD_REQUEST
         )
@@ -89,10 +176,11 @@ class SubscriptionsList(generics.ListAPIView):
     """
     permission_classes = (IsAuthenticated,)
     serializer_class = FollowSerializer
+    throttle_costs = {'get': 5}
 
     def get_queryset(self):
         user = self.request.user
-        return Follow.objects.filter(user=user)
+        return Follow.objects.filter(user=user).select_related('author')
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
@@ -108,6 +196,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     permission_classes = [IsAuthorOrReadOnly | IsAdminOrReadOnly]
+    throttle_costs = {
+        'download_shopping_cart': 20,
+        'favorite_batch': 5,
+        'shopping_cart_batch': 5,
+        'feed': 2,
+    }
 
     def get_serializer_class(self):
         if self.action in ['retrieve', 'list']:
@@ -133,30 +227,256 @@ class RecipeViewSet(viewsets.ModelViewSet):
             )
         return queryset
 
+    def get_fields(self):
+        """
+        Поля ответа из ?view=card или ?fields=id,name,...
+        """
+        if self.request.query_params.get('view') == 'card':
+            return CARD_FIELDS
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return RECIPE_FIELDS
+        fields = set(fields.split(','))
+        unknown = fields - set(RECIPE_FIELDS)
+        if unknown:
+            raise ValidationError(
+                {'fields': UNKNOWN_FIELDS.format(', '.join(sorted(unknown)))}
+            )
+        return tuple(field for field in RECIPE_FIELDS if field in fields)
+
+    def get_values(self, queryset, fields=RECIPE_FIELDS):
+        return queryset.prefetch_related(None).select_related(None).values(
+            *get_value_fields(fields, self.request.user)
+        )
+
+    def get_list_response(self, queryset):
+        fields = self.get_fields()
+        queryset = self.get_values(queryset, fields)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                get_recipes_data(page, self.request, fields)
+            )
+        return Response(get_recipes_data(queryset, self.request, fields))
+
+    def get_etag(self, *markers):
+        """
+        Слабый ETag из маркеров версии данных, версии коллекций
+        пользователя и параметров запроса.
+        """
+        user = self.request.user
+        key = '|'.join(str(marker) for marker in (
+            self.request.get_full_path(), self.request.accepted_media_type,
+            user.id, getattr(user, 'collections_version', 0), *markers,
+        ))
+        return f'W/"{md5(key.encode()).hexdigest()}"'
+
+    def get_conditional_response(self, etag, get_response):
+        """
+        Отвечает 304 на совпавший If-None-Match, не строя ответ.
+        """
+        response = get_conditional_response(self.request, etag=etag)
+        if response is None:
+            response = get_response()
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def get_rows(self, queryset, recipe_ids, fields):
+        """
+        Строки рецептов с данными id в порядке recipe_ids.
+        """
+        position = {recipe_id: index for index, recipe_id in enumerate(
+            recipe_ids
+        )}
+        return sorted(self.get_values(
+            queryset.filter(id__in=recipe_ids), fields
+        ), key=lambda row: position[row['id']])
+
+    def get_page_response(self, queryset, recipe_ids, paginated):
+        fields = self.get_fields()
+        data = get_recipes_data(
+            self.get_rows(queryset, recipe_ids, fields), self.request, fields
+        )
+        if not paginated:
+            return Response(data)
+        return self.get_paginated_response(data)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        # ETag строится по странице: число рецептов пагинатору нужно и
+        # так, а id и даты изменения страницы читаются по индексу
+        # сортировки, без агрегата по всей выборке.
+        markers = queryset.prefetch_related(None).select_related(
+            None
+        ).values_list('id', 'updated_at')
+        page = self.paginate_queryset(markers)
+        paginated = page is not None
+        if paginated:
+            count = self.paginator.page.paginator.count
+        else:
+            page = list(markers)
+            count = len(page)
+        return self.get_conditional_response(
+            self.get_etag(count, *page),
+            lambda: self.get_page_response(
+                queryset, [recipe_id for recipe_id, _ in page],
+                paginated,
+            )
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs['pk']
+        if not pk.isdigit():
+            raise NotFound
+        row = (
+            get_snapshot(int(pk), request.user)
+            or get_archived(int(pk), request.user)
+        )
+        if row is None:
+            raise NotFound
+        return self.get_conditional_response(
+            self.get_etag(row['updated_at']),
+            lambda: Response(render_snapshot(row, request))
+        )
+
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        recipe = serializer.save(author=self.request.user)
+        change_counter('recipes_count', [recipe.author_id])
+        enqueue(
+            fan_out_recipe, key=f'fan_out_recipe:{recipe.id}',
+            recipe_id=recipe.id
+        )
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        soft_delete([instance.id])
+        enqueue(purge_deleted_recipes)
+
+    @action(
+        detail=False, methods=['GET'],
+        permission_classes=(IsAuthenticated,)
+    )
+    def feed(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        entries = get_feed(request.user, queryset)
+        page = self.paginate_queryset(entries)
+        return self.get_page_response(queryset, [
+            entry['recipe_id'] for entry in (
+                entries if page is None else page
+            )
+        ], page is not None)
 
-    def add_recipe(self, model, request, pk):
+    @action(detail=True, methods=['GET'])
+    def similar(self, request, pk):
+        if not pk.isdigit():
+            raise NotFound
+        return self.get_list_response(self.filter_queryset(
+            self.get_queryset()
+        ).filter(similar_for__recipe_id=pk).order_by('-similar_for__score'))
+
+    @action(
+        detail=False, methods=['GET'],
+        permission_classes=(IsAuthenticated,)
+    )
+    def recommendations(self, request):
+        return self.get_list_response(self.filter_queryset(
+            self.get_queryset()
+        ).filter(
+            recommended_to__user=request.user
+        ).order_by('-recommended_to__score'))
+
+    @transaction.atomic
+    def add_recipe(self, model, request, pk, **fields):
         recipe = get_object_or_404(Recipe, id=pk)
-        obj, created = model.objects.get_or_create(
-            recipe=recipe, user=request.user
-        )
-        if not created:
+        if not insert_ignore(
+            model(recipe=recipe, user=request.user, **fields)
+        ):
             return Response({'errors': 'Данный рецепт уже был добавлен'},
                             status=HTTPStatus.BAD_REQUEST)
+        bump_collections_version(request.user)
+        change_favorites_count(model, request.user, 1)
+        export_cart(model, request.user)
+        record(model._meta.model_name, 'added',
+               user_id=request.user.id, recipe_id=recipe.id)
         serializer = RecipeForFollowersSerializer(recipe)
         return Response(data=serializer.data, status=HTTPStatus.CREATED)
 
+    @transaction.atomic
     def delete_recipe(self, model, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
+        if not pk.isdigit():
+            raise NotFound
         recipes, _ = model.objects.filter(
-            user=request.user, recipe=recipe
+            user=request.user, recipe_id=pk, recipe__deleted_at__isnull=True
         ).delete()
         if recipes:
+            bump_collections_version(request.user)
+            change_favorites_count(model, request.user, -1)
+            export_cart(model, request.user)
+            record(model._meta.model_name, 'removed',
+                   user_id=request.user.id, recipe_id=int(pk))
             return Response(status=HTTPStatus.NO_CONTENT)
+        get_object_or_404(Recipe, id=pk)
         return Response({'errors': 'Такой рецепт не добавлялся'},
                         status=HTTPStatus.NOT_FOUND)
 
+    @transaction.atomic
+    def add_recipes(self, model, request):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['recipes']
+        found = set(Recipe.objects.filter(id__in=ids).values_list(
+            'id', flat=True
+        ))
+        # RETURNING отдает только строки, вставленные этим запросом, даже
+        # если параллельный запрос добавляет те же рецепты.
+        added = insert_ignore_many([
+            model(user=request.user, recipe_id=recipe_id)
+            for recipe_id in ids if recipe_id in found
+        ], 'recipe')
+        if added:
+            bump_collections_version(request.user)
+            change_favorites_count(model, request.user, len(added))
+            export_cart(model, request.user)
+            record_many(model._meta.model_name, 'added', [
+                {'user_id': request.user.id, 'recipe_id': recipe_id}
+                for recipe_id in added
+            ])
+        added = set(added)
+        return Response({'results': [
+            {'id': recipe_id, 'status': (
+                BATCH_NOT_FOUND if recipe_id not in found
+                else BATCH_ADDED if recipe_id in added
+                else BATCH_ALREADY_ADDED
+            )} for recipe_id in ids
+        ]})
+
+    @transaction.atomic
+    def delete_recipes(self, model, request):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['recipes']
+        entries = model.objects.filter(
+            user=request.user, recipe_id__in=ids,
+            recipe__deleted_at__isnull=True,
+        )
+        added = set(entries.values_list('recipe_id', flat=True))
+        if added:
+            deleted, _ = entries.delete()
+            bump_collections_version(request.user)
+            change_favorites_count(model, request.user, -deleted)
+            export_cart(model, request.user)
+            record_many(model._meta.model_name, 'removed', [
+                {'user_id': request.user.id, 'recipe_id': recipe_id}
+                for recipe_id in added
+            ])
+        return Response({'results': [
+            {'id': recipe_id, 'status': (
+                BATCH_DELETED if recipe_id in added else BATCH_NOT_ADDED
+            )} for recipe_id in ids
+        ]})
+
     @action(
         detail=True, methods=['DELETE', 'POST'],
         permission_classes=(IsAuthenticated,)
@@ -168,24 +488,54 @@ class RecipeViewSet(viewsets.ModelViewSet):
             Favorite, request, pk
         )
 
+    @transaction.atomic
+    def update_servings(self, request, pk):
+        entry = get_object_or_404(
+            ShoppingCart, user=request.user, recipe_id=pk
+        )
+        serializer = ShoppingCartServingsSerializer(entry, data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        bump_collections_version(request.user)
+        export_cart(ShoppingCart, request.user)
+        return Response(serializer.data)
+
     @action(
-        detail=True, methods=['DELETE', 'POST'],
+        detail=True, methods=['DELETE', 'PATCH', 'POST'],
         permission_classes=(IsAuthenticated,)
     )
     def shopping_cart(self, request, pk):
-        return self.add_recipe(
-            ShoppingCart, request, pk
-        ) if request.method == 'POST' else self.delete_recipe(
-            ShoppingCart, request, pk
+        if request.method == 'PATCH':
+            return self.update_servings(request, pk)
+        if request.method == 'POST':
+            serializer = ShoppingCartServingsSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            return self.add_recipe(
+                ShoppingCart, request, pk, **serializer.validated_data
+            )
+        return self.delete_recipe(ShoppingCart, request, pk)
+
+    @action(
+        detail=False, methods=['DELETE', 'POST'], url_path='favorite/batch',
+        permission_classes=(IsAuthenticated,)
+    )
+    def favorite_batch(self, request):
+        return self.add_recipes(
+            Favorite, request
+        ) if request.method == 'POST' else self.delete_recipes(
+            Favorite, request
         )
 
-    def generate_shopping_cart_text(self, ingredients):
-        text = 'Продукты к покупке:\n'
-        for ingredient in ingredients:
-            text += f'- {ingredient["ingredients__name"]} - '
-            text += f'{ingredient["value"]} '
-            text += f'{ingredient["ingredients__measurement_unit"]}\n'
-        return text
+    @action(
+        detail=False, methods=['DELETE', 'POST'],
+        url_path='shopping_cart/batch', permission_classes=(IsAuthenticated,)
+    )
+    def shopping_cart_batch(self, request):
+        return self.add_recipes(
+            ShoppingCart, request
+        ) if request.method == 'POST' else self.delete_recipes(
+            ShoppingCart, request
+        )
 
     @action(
         detail=False, methods=['GET'],
@@ -194,16 +544,18 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def download_shopping_cart(self, request):
         user = request.user
         file = 'shopping_products.txt'
-        if not user.shopping_cart.exists():
+        version = get_cart_version(user)
+        if version is None:
             return Response(status=HTTPStatus.BAD_REQUEST)
-        ingredients = AmountIngredient.objects.filter(
-            recipe__shopping_cart__user=user
-        ).values(
-            'ingredients__name', 'ingredients__measurement_unit'
-        ).annotate(value=Sum('amount')).order_by('ingredients__name')
+        # Обычно список уже собран задачей export_shopping_cart после
+        # изменения корзины; если нет, он собирается и сохраняется здесь.
+        text = get_shopping_cart_text(user, version)
+        if text is None:
+            text = render_shopping_cart(user.id)
+            save_shopping_cart_text(user, version, text)
         response = HttpResponse(content_type='text/plain', charset='utf-8')
         response['Content-Disposition'] = f'attachment; filename={file}'
-        response.write(self.generate_shopping_cart_text(ingredients))
+        response.write(text)
         return response
 
 
@@ -219,3 +571,17 @@ class IngredientViewSet(viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend, filters.SearchFilter,)
     filterset_class = IngredientFilter
     pagination_class = None
+    throttle_costs = {'list': 2}
+
+
+class MetricsView(APIView):
+    """
+    Статистика запросов по представлениям в формате Prometheus.
+    """
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return HttpResponse(
+            endpoint_stats.to_prometheus(),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
@@ -0,0 +1,27 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Event
+
+RETRIED = 'Возвращено в очередь событий: {count}'
+
+
+@admin.register(Event)
+class EventAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'topic', 'action', 'key', 'attempts', 'available_at',
+        'failed_at', 'created_at',
+    )
+    list_filter = (
+        'topic', 'action', ('failed_at', admin.EmptyFieldListFilter),
+    )
+    search_fields = ('key',)
+    actions = ('retry',)
+    empty_value_display = '-пусто-'
+
+    @admin.action(description='Вернуть в очередь')
+    def retry(self, request, queryset):
+        count = queryset.update(
+            attempts=0, failed_at=None, available_at=timezone.now()
+        )
+        self.message_user(request, RETRIED.format(count=count))
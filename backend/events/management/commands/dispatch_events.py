@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from events.outbox import dispatch
+
+NO_URLS = ('Не заданы WEBHOOK_URLS: события остаются в outbox до запуска '
+           'диспетчера с адресами')
+
+
+class Command(BaseCommand):
+    help = 'Отправляет события об изменении рецептов на вебхуки'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--interval', type=float, default=1,
+            help='пауза в секундах, если событий нет или доставка не удалась'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='отправить доступные события и завершиться'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.WEBHOOKS['URLS']:
+            self.stderr.write(NO_URLS)
+            return
+        try:
+            while True:
+                sent = dispatch(options['batch_size'])
+                if sent:
+                    self.stdout.write(f'Отправлено событий: {sent}')
+                    continue
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Остановка диспетчера')
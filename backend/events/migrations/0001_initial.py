@@ -0,0 +1,38 @@
+# Generated by Django 3.2.15 on 2026-10-19 10:17
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Event',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=50, verbose_name='Тема')),
+                ('action', models.CharField(max_length=50, verbose_name='Действие')),
+                ('key', models.CharField(max_length=200, verbose_name='Ключ объекта')),
+                ('payload', models.JSONField(default=dict, verbose_name='Данные')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток доставки')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Отправить не раньше')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+            ],
+            options={
+                'verbose_name': 'Событие',
+                'verbose_name_plural': 'Исходящие события',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['available_at', 'id'], name='event_available_at_idx'),
+        ),
+    ]
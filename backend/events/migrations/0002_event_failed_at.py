@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-19 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='failed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Доставка прекращена'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Event(models.Model):
+    topic = models.CharField(
+        'Тема',
+        max_length=50,
+    )
+    action = models.CharField(
+        'Действие',
+        max_length=50,
+    )
+    key = models.CharField(
+        'Ключ объекта',
+        max_length=200,
+    )
+    payload = models.JSONField(
+        'Данные',
+        default=dict,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        'Попыток доставки',
+        default=0,
+    )
+    available_at = models.DateTimeField(
+        'Отправить не раньше',
+        default=timezone.now,
+    )
+    last_error = models.TextField(
+        'Последняя ошибка',
+        blank=True,
+    )
+    failed_at = models.DateTimeField(
+        'Доставка прекращена',
+        null=True,
+        blank=True,
+    )
+    created_at = models.DateTimeField(
+        'Создано',
+        auto_now_add=True,
+    )
+
+    class Meta:
+        ordering = ['id', ]
+        verbose_name = 'Событие'
+        verbose_name_plural = 'Исходящие события'
+        indexes = [
+            models.Index(
+                fields=['available_at', 'id'],
+                name='event_available_at_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.topic}.{self.action} {self.key}'
@@ -0,0 +1,147 @@
+import hashlib
+import hmac
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Event
+
+logger = logging.getLogger('foodgram.events')
+
+MAX_RETRY_DELAY = 3600
+
+
+def get_key(topic, payload):
+    return ':'.join([topic, *(str(payload[name]) for name in sorted(payload))])
+
+
+def record_many(topic, action, payloads):
+    """
+    Записывает события в outbox.
+
+    Вызывается в той же транзакции, что и изменение, поэтому событие
+    появляется только вместе с закоммиченными данными. События пишутся
+    при WEBHOOKS['ENABLED'], даже если адресов вебхуков процесс не знает:
+    их отправит диспетчер.
+    """
+    if not settings.WEBHOOKS['ENABLED']:
+        return
+    Event.objects.bulk_create([
+        Event(
+            topic=topic, action=action,
+            key=get_key(topic, payload), payload=payload,
+        ) for payload in payloads
+    ])
+
+
+def record(topic, action, **payload):
+    record_many(topic, action, [payload])
+
+
+@transaction.atomic
+def claim(limit):
+    """
+    Забирает события, готовые к отправке.
+
+    Пока идет доставка, события скрыты от других диспетчеров на
+    WEBHOOKS['VISIBILITY_TIMEOUT'] секунд.
+    """
+    now = timezone.now()
+    event_ids = list(Event.objects.select_for_update(skip_locked=True).filter(
+        available_at__lte=now, failed_at__isnull=True
+    ).order_by('id').values_list('id', flat=True)[:limit])
+    Event.objects.filter(id__in=event_ids).update(
+        available_at=now + timedelta(
+            seconds=settings.WEBHOOKS['VISIBILITY_TIMEOUT']
+        )
+    )
+    return list(Event.objects.filter(id__in=event_ids).order_by('id'))
+
+
+def coalesce(events):
+    """
+    Оставляет по одному, последнему, событию на объект.
+    """
+    latest = {}
+    for event in events:
+        latest.pop(event.key, None)
+        latest[event.key] = event
+    return list(latest.values())
+
+
+def deliver(events):
+    # HTTP-клиент нужен только диспетчеру, веб-процессы его не загружают.
+    from urllib.request import Request, urlopen
+
+    body = json.dumps({'events': [
+        {
+            'id': event.id,
+            'topic': event.topic,
+            'action': event.action,
+            'payload': event.payload,
+            'created_at': event.created_at,
+        } for event in events
+    ]}, cls=DjangoJSONEncoder).encode()
+    headers = {'Content-Type': 'application/json'}
+    secret = settings.WEBHOOKS['SECRET']
+    if secret:
+        headers['X-Foodgram-Signature'] = hmac.new(
+            secret.encode(), body, hashlib.sha256
+        ).hexdigest()
+    for url in settings.WEBHOOKS['URLS']:
+        with urlopen(
+            Request(url, data=body, headers=headers, method='POST'),
+            timeout=settings.WEBHOOKS['TIMEOUT'],
+        ):
+            pass
+
+
+def dispatch(limit):
+    """
+    Отправляет пачку событий на все вебхуки и возвращает их число
+    (0, если отправлять нечего, некуда или доставка не удалась).
+
+    Пачка считается доставленной, только если ее приняли все адреса,
+    иначе она целиком повторяется с экспоненциальной задержкой, так что
+    получатели должны обрабатывать повторы идемпотентно. После
+    WEBHOOKS['MAX_ATTEMPTS'] попыток доставка событий прекращается, их
+    можно вернуть в очередь действием в админке.
+    """
+    # Обрыв ответа и неверная строка статуса не наследуют OSError.
+    from http.client import HTTPException
+
+    if not settings.WEBHOOKS['URLS']:
+        return 0
+    events = claim(limit)
+    if not events:
+        return 0
+    event_ids = [event.id for event in events]
+    try:
+        deliver(coalesce(events))
+    except (OSError, ValueError, HTTPException) as error:
+        logger.warning('Не удалось отправить события: %s', error)
+        attempts = max(event.attempts for event in events) + 1
+        now = timezone.now()
+        failed = attempts >= settings.WEBHOOKS['MAX_ATTEMPTS']
+        if failed:
+            logger.error(
+                'События %s не доставлены за %s попыток',
+                event_ids, attempts,
+            )
+        Event.objects.filter(id__in=event_ids).update(
+            attempts=F('attempts') + 1,
+            available_at=now + timedelta(
+                seconds=min(2 ** attempts, MAX_RETRY_DELAY)
+            ),
+            last_error=str(error),
+            failed_at=now if failed else None,
+        )
+        return 0
+    Event.objects.filter(id__in=event_ids).delete()
+    return len(events)
@@ -0,0 +1,32 @@
+from django.contrib import admin
+
+
+class InputFilter(admin.SimpleListFilter):
+    """
+    Фильтр админки с текстовым полем вместо списка всех значений.
+
+    Подходит для полей с большим числом значений (авторы, email), где
+    обычный list_filter выбирает и выводит каждое значение.
+    """
+    template = 'admin/input_filter.html'
+    lookup = None
+
+    def lookups(self, request, model_admin):
+        return ((),)
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.lookup: self.value().strip()})
+        return queryset
+
+    def choices(self, changelist):
+        yield {
+            'query_string': changelist.get_query_string(
+                remove=[self.parameter_name]
+            ),
+            'query_parts': (
+                (key, value)
+                for key, value in changelist.get_filters_params().items()
+                if key != self.parameter_name
+            ),
+        }
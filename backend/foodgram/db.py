@@ -0,0 +1,54 @@
+from django.db import connections, router
+from django.db.models import sql
+
+
+def get_insert_statements(model, objs, using):
+    fields = [
+        field for field in model._meta.local_concrete_fields
+        if field is not model._meta.auto_field
+    ]
+    query = sql.InsertQuery(model, ignore_conflicts=True)
+    query.insert_values(fields, objs)
+    return query.get_compiler(using).as_sql()
+
+
+def insert_ignore(obj):
+    """
+    Вставляет строку одним INSERT ... ON CONFLICT DO NOTHING.
+
+    В отличие от get_or_create не делает предварительный SELECT и не
+    падает с IntegrityError при одновременных запросах. Возвращает
+    True, если строка вставлена, и False, если такая уже была.
+    """
+    model = type(obj)
+    using = router.db_for_write(model, instance=obj)
+    inserted = 0
+    with connections[using].cursor() as cursor:
+        for statement, params in get_insert_statements(model, [obj], using):
+            cursor.execute(statement, params)
+            inserted += cursor.rowcount
+    return inserted > 0
+
+
+def insert_ignore_many(objs, returning):
+    """
+    Вставляет строки одним INSERT ... ON CONFLICT DO NOTHING RETURNING.
+
+    Возвращает значения поля returning только у вставленных строк:
+    строки, которые уже были или которые одновременно вставил другой
+    запрос, в результат не попадают.
+    """
+    if not objs:
+        return []
+    model = type(objs[0])
+    using = router.db_for_write(model, instance=objs[0])
+    connection = connections[using]
+    column = connection.ops.quote_name(
+        model._meta.get_field(returning).column
+    )
+    values = []
+    with connection.cursor() as cursor:
+        for statement, params in get_insert_statements(model, objs, using):
+            cursor.execute(f'{statement} RETURNING {column}', params)
+            values.extend(value for value, in cursor.fetchall())
+    return values
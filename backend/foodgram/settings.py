@@ -29,9 +29,13 @@ INSTALLED_APPS = [
     'api.apps.ApiConfig',
     'recipes.apps.RecipesConfig',
     'users.apps.UsersConfig',
+    'jobs.apps.JobsConfig',
+    'events.apps.EventsConfig',
 ]
 
 MIDDLEWARE = [
+    'api.middleware.InstrumentationMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -46,7 +50,7 @@ ROOT_URLCONF = 'foodgram.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -101,13 +105,31 @@ USE_TZ = True
 
 STATIC_URL = '/static_backend/'
 STATIC_ROOT = BASE_DIR / 'collect_static'
+STATICFILES_STORAGE = 'foodgram.storage.CompressedStaticFilesStorage'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Общий для всех воркеров кэш: в нем лежат ведра ограничения частоты
+# запросов. Без memcached кэш у каждого процесса свой, и лимит
+# считается отдельно в каждом воркере gunicorn.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': os.getenv('MEMCACHED_LOCATION'),
+    } if os.getenv('MEMCACHED_LOCATION') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
@@ -118,11 +140,65 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttles.UserTokenBucketThrottle',
+        'api.throttles.AnonTokenBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'user': os.getenv('THROTTLE_RATE_USER', '120/min'),
+        'anon': os.getenv('THROTTLE_RATE_ANON', '60/min'),
+    },
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.LimitPageNumberPagination',
     'PAGE_SIZE': 6,
     'PAGE_SIZE_QUERY_PARAM': 'limit',
 }
 
+COMPRESSION = {
+    'MIN_LENGTH': int(os.getenv('COMPRESSION_MIN_LENGTH', 1024)),
+    'BROTLI_QUALITY': int(os.getenv('COMPRESSION_BROTLI_QUALITY', 5)),
+}
+
+JOBS = {
+    'EAGER': os.getenv('JOBS_EAGER', 'False') == 'True',
+    'MAX_ATTEMPTS': int(os.getenv('JOBS_MAX_ATTEMPTS', 5)),
+    'VISIBILITY_TIMEOUT': int(os.getenv('JOBS_VISIBILITY_TIMEOUT', 300)),
+}
+
+WEBHOOKS = {
+    # Включает запись событий; адреса может знать только диспетчер.
+    'ENABLED': os.getenv('WEBHOOKS_ENABLED', 'False') == 'True',
+    'URLS': os.getenv('WEBHOOK_URLS', '').split(),
+    'SECRET': os.getenv('WEBHOOK_SECRET', ''),
+    'TIMEOUT': float(os.getenv('WEBHOOK_TIMEOUT', 5)),
+    'VISIBILITY_TIMEOUT': int(os.getenv('WEBHOOK_VISIBILITY_TIMEOUT', 60)),
+    'MAX_ATTEMPTS': int(os.getenv('WEBHOOK_MAX_ATTEMPTS', 15)),
+}
+
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', 1000))
+
+FEED_BACKFILL_SIZE = int(os.getenv('FEED_BACKFILL_SIZE', 50))
+
+INSTRUMENTATION = {
+    'ENABLED': os.getenv('INSTRUMENTATION', 'False') == 'True',
+    'LOG_SLOWEST_QUERIES': int(os.getenv('INSTRUMENTATION_SLOWEST_QUERIES', 0)),
+    # Каталог, через который процессы складывают метрики /api/metrics/;
+    # gunicorn.conf.py задает его для воркеров сам.
+    'STATS_DIR': os.getenv('INSTRUMENTATION_STATS_DIR') or None,
+    # Как часто воркер обновляет свой файл в STATS_DIR, секунды.
+    'FLUSH_INTERVAL': float(os.getenv('INSTRUMENTATION_FLUSH_INTERVAL', 5)),
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'foodgram': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'SEND_ACTIVATION_EMAIL': False,
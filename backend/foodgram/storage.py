@@ -0,0 +1,36 @@
+import gzip
+
+from django.contrib.staticfiles.storage import StaticFilesStorage
+from django.core.files.base import ContentFile
+
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.json', '.map', '.svg', '.txt', '.html', '.xml',
+)
+MIN_LENGTH = 1024
+
+
+class CompressedStaticFilesStorage(StaticFilesStorage):
+    """
+    Хранилище статики, которое кладет рядом с файлами .gz копии.
+
+    nginx отдает их без сжатия на лету (gzip_static), так что
+    collectstatic выполняет эту работу один раз при сборке. Копии .br
+    не пишутся: в образе nginx нет модуля brotli_static.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+        for name in paths:
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            with self.open(name) as file:
+                content = file.read()
+            if len(content) < MIN_LENGTH:
+                continue
+            if self.exists(f'{name}.gz'):
+                self.delete(f'{name}.gz')
+            self.save(f'{name}.gz', ContentFile(
+                gzip.compress(content, compresslevel=9, mtime=0)
+            ))
+            yield name, name, True
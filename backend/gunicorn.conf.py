@@ -0,0 +1,87 @@
+"""
+Настройки gunicorn для образа backend.
+
+Все значения можно переопределить переменными окружения GUNICORN_*.
+"""
+import gc
+import os
+import shutil
+import tempfile
+
+
+def get_cpu_count():
+    # Учитывает ограничение контейнера по ядрам (cpuset).
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:9000')
+workers = int(os.getenv('GUNICORN_WORKERS', get_cpu_count() * 2 + 1))
+# При threads > 1 gunicorn использует воркеры gthread.
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+worker_class = os.getenv(
+    'GUNICORN_WORKER_CLASS', 'gthread' if threads > 1 else 'sync'
+)
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+# Воркер перезапускается после max_requests ± jitter запросов, так что
+# утечки памяти ограничены, а воркеры не уходят на перезапуск разом.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+# Приложение загружается в мастере, воркеры делят его память через
+# copy-on-write.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+# Heartbeat воркеров в памяти, а не на диске контейнера.
+worker_tmp_dir = os.getenv('GUNICORN_WORKER_TMP_DIR') or (
+    '/dev/shm' if os.path.isdir('/dev/shm') else None
+)
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+# Воркеры складывают метрики /api/metrics/ через файлы в этом каталоге,
+# иначе каждый ответ показывал бы счетчики одного случайного воркера.
+stats_dir = os.environ.setdefault(
+    'INSTRUMENTATION_STATS_DIR', os.path.join(
+        worker_tmp_dir or tempfile.gettempdir(),
+        f'foodgram-metrics-{os.getpid()}',
+    )
+)
+
+
+def on_starting(server):
+    # Счетчики прошлого запуска в метрики не попадают.
+    shutil.rmtree(stats_dir, ignore_errors=True)
+
+
+def when_ready(server):
+    """
+    Загружает urlconf с вьюхами в мастере до запуска воркеров.
+    """
+    if not preload_app:
+        return
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+    # Объекты мастера больше не трогает сборщик мусора, и их страницы
+    # не копируются в воркерах.
+    gc.freeze()
+
+
+def pre_fork(server, worker):
+    # Соединения мастера не должны достаться воркерам: общий сокет
+    # сломается, как только его закроет любой из процессов. Без
+    # preload_app мастер Django не загружает.
+    if preload_app:
+        from django.db import connections
+        connections.close_all()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from django.db import connections
+        connections.close_all()
+
+
+def worker_exit(server, worker):
+    from api.middleware import endpoint_stats
+    endpoint_stats.retire()
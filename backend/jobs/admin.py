@@ -0,0 +1,13 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'name', 'status', 'attempts', 'run_at', 'created_at',
+    )
+    list_filter = ('status', 'name',)
+    search_fields = ('idempotency_key',)
+    empty_value_display = '-пусто-'
@@ -0,0 +1,96 @@
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management import BaseCommand
+from django.db import close_old_connections, connections
+
+from jobs.queue import claim, execute
+
+logger = logging.getLogger('foodgram.jobs')
+
+POOL_BROKEN = (
+    'Процесс воркера аварийно завершился, задачи %s вернутся в очередь '
+    'после времени видимости'
+)
+
+
+def run(job_id):
+    close_old_connections()
+    return execute(job_id)
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2)
+        parser.add_argument(
+            '--batch-size', type=int, default=10,
+            help='сколько задач забирать из очереди за раз'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1,
+            help='пауза в секундах, если очередь пуста'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='выполнить доступные задачи и завершиться'
+        )
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        running = {}
+        pool = ProcessPoolExecutor(max_workers=processes)
+        try:
+            while True:
+                try:
+                    # Задачи забираются только под свободные процессы:
+                    # забранная, но не начатая задача зря тратила бы
+                    # время видимости, а медленная не держит остальные.
+                    free = processes - len(running)
+                    job_ids = free and claim(min(free, options['batch_size']))
+                    if job_ids:
+                        # Дочерние процессы не должны унаследовать
+                        # открытое соединение с базой.
+                        connections.close_all()
+                        running.update(
+                            (pool.submit(run, job_id), job_id)
+                            for job_id in job_ids
+                        )
+                        if len(running) < processes:
+                            continue
+                    if not running:
+                        if options['once']:
+                            return
+                        time.sleep(options['interval'])
+                        continue
+                    done, _ = wait(
+                        running, options['interval'],
+                        return_when=FIRST_COMPLETED,
+                    )
+                    self.report(done)
+                    for future in done:
+                        del running[future]
+                except BrokenProcessPool:
+                    # Процесс убит (OOM, segfault): пул больше не
+                    # принимает задач. Его задачи остаются running, и
+                    # claim() вернет их в очередь или пометит failed.
+                    logger.error(POOL_BROKEN, sorted(running.values()))
+                    pool.shutdown(wait=False)
+                    pool = ProcessPoolExecutor(max_workers=processes)
+                    running = {}
+        except KeyboardInterrupt:
+            self.stdout.write('Остановка воркера')
+        finally:
+            pool.shutdown()
+
+    def report(self, done):
+        if not done:
+            return
+        results = [future.result() for future in done]
+        self.stdout.write(
+            f'Выполнено задач: {sum(results)}, '
+            f'с ошибкой: {len(results) - sum(results)}'
+        )
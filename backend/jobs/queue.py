@@ -0,0 +1,114 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger('foodgram.jobs')
+
+registry = {}
+
+TIMED_OUT = 'Воркер не завершил задачу за время видимости'
+
+
+def task(func):
+    """
+    Регистрирует функцию как фоновую задачу.
+
+    Аргументы задачи хранятся в JSON, поэтому функция должна принимать
+    только именованные аргументы простых типов.
+    """
+    registry[get_name(func)] = func
+    return func
+
+
+def get_name(func):
+    return f'{func.__module__}.{func.__name__}'
+
+
+def is_pending(func, **payload):
+    """
+    Есть ли в очереди еще не начатая задача с такими аргументами.
+    """
+    return Job.objects.filter(
+        name=get_name(func), status=Job.PENDING, payload=payload
+    ).exists()
+
+
+def enqueue(func, key=None, **payload):
+    """
+    Ставит задачу в очередь.
+
+    Задача с уже существующим key повторно не создается. При
+    JOBS['EAGER'] задача выполняется сразу, без очереди.
+    """
+    if settings.JOBS['EAGER']:
+        func(**payload)
+        return
+    Job.objects.bulk_create([Job(
+        name=get_name(func),
+        payload=payload,
+        idempotency_key=key,
+        max_attempts=settings.JOBS['MAX_ATTEMPTS'],
+    )], ignore_conflicts=True)
+
+
+@transaction.atomic
+def claim(limit):
+    """
+    Забирает готовые к выполнению задачи и возвращает их id.
+
+    Задача, которую взял упавший воркер, снова становится доступна
+    после истечения JOBS['VISIBILITY_TIMEOUT'] секунд. Если попытки
+    у нее кончились (например, она каждый раз роняет процесс воркера),
+    задача помечается как failed.
+    """
+    now = timezone.now()
+    Job.objects.filter(
+        status=Job.RUNNING, locked_until__lt=now,
+        attempts__gte=F('max_attempts'),
+    ).update(status=Job.FAILED, locked_until=None, last_error=TIMED_OUT)
+    job_ids = list(Job.objects.select_for_update(skip_locked=True).filter(
+        Q(status=Job.PENDING, run_at__lte=now)
+        | Q(status=Job.RUNNING, locked_until__lt=now)
+    ).order_by('run_at').values_list('id', flat=True)[:limit])
+    Job.objects.filter(id__in=job_ids).update(
+        status=Job.RUNNING,
+        attempts=F('attempts') + 1,
+        locked_until=now + timedelta(
+            seconds=settings.JOBS['VISIBILITY_TIMEOUT']
+        ),
+    )
+    return job_ids
+
+
+def execute(job_id):
+    """
+    Выполняет задачу и сохраняет результат.
+
+    Неудачная попытка откладывает задачу с экспоненциальной задержкой,
+    после max_attempts попыток задача помечается как failed.
+    """
+    job = Job.objects.get(id=job_id)
+    try:
+        func = registry[job.name]
+        func(**job.payload)
+    except Exception:
+        logger.exception('Задача %s (%s) завершилась ошибкой', job.id, job)
+        failed = job.attempts >= job.max_attempts
+        Job.objects.filter(id=job.id).update(
+            status=Job.FAILED if failed else Job.PENDING,
+            run_at=timezone.now() + timedelta(seconds=2 ** job.attempts),
+            locked_until=None,
+            last_error=traceback.format_exc(),
+        )
+        return False
+    Job.objects.filter(id=job.id).update(
+        status=Job.DONE, locked_until=None, last_error=''
+    )
+    return True
@@ -1,7 +1,70 @@
 from django.contrib import admin
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
 
-from .models import (AmountIngredient, Favorite, Ingredient, Recipe,
-                     ShoppingCart, Tag)
+from events.outbox import record
+from foodgram.admin_filters import InputFilter
+from jobs.queue import enqueue
+from users.counters import change_counter, count_subquery
+
+from .archive import restore_recipes, soft_delete
+from .models import (AmountIngredient, ArchivedRecipe, Favorite, FeedEntry,
+                     Ingredient, Recipe, ShoppingCart, Tag)
+from .snapshots import SNAPSHOT_BATCH_SIZE, refresh_snapshots, touch_recipes
+from .tasks import (fan_out_recipe, purge_deleted_recipes,
+                    refresh_related_snapshots)
+
+RESTORED = 'Восстановлено рецептов: {count}'
+
+
+class AuthorFilter(InputFilter):
+    title = 'автору'
+    parameter_name = 'author'
+    lookup = 'author__username'
+
+
+class UserFilter(InputFilter):
+    title = 'пользователю'
+    parameter_name = 'user'
+    lookup = 'user__username'
+
+
+class RelatedRecipesAdmin(admin.ModelAdmin):
+    """
+    Сбрасывает ETag и пересобирает снимки рецептов после правки или
+    удаления тэга или ингредиента.
+
+    После удаления связь с рецептами уже не найти, поэтому их id
+    выбираются заранее и передаются в задачи пачками.
+    """
+    recipe_lookup = None
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change:
+            touch_recipes(**{self.recipe_lookup: obj.id})
+            enqueue(refresh_related_snapshots, **{self.recipe_lookup: obj.id})
+
+    def get_recipe_ids(self, queryset):
+        return list(Recipe.objects.filter(**{
+            f'{self.recipe_lookup}__in': queryset.values('id')
+        }).order_by('id').values_list('id', flat=True).distinct())
+
+    def refresh_recipes(self, recipe_ids):
+        for start in range(0, len(recipe_ids), SNAPSHOT_BATCH_SIZE):
+            batch = recipe_ids[start:start + SNAPSHOT_BATCH_SIZE]
+            touch_recipes(id__in=batch)
+            enqueue(refresh_related_snapshots, id__in=batch)
+
+    def delete_model(self, request, obj):
+        recipe_ids = self.get_recipe_ids(self.model.objects.filter(id=obj.id))
+        super().delete_model(request, obj)
+        self.refresh_recipes(recipe_ids)
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = self.get_recipe_ids(queryset)
+        super().delete_queryset(request, queryset)
+        self.refresh_recipes(recipe_ids)
 
 
 class RecipeIngredientsAdmin(admin.StackedInline):
@@ -15,40 +78,129 @@ class RecipeAdmin(admin.ModelAdmin):
         'id', 'name', 'author', 'text',
         'cooking_time', 'pub_date', 'favorite_counter'
     )
-    search_fields = (
-        'name', 'cooking_time', 'author__username', 'ingredients__name'
-    )
-    list_filter = ('author', 'name', 'tags',)
+    list_select_related = ('author',)
+    search_fields = ('name', 'author__username',)
+    list_filter = (AuthorFilter, 'tags',)
     inlines = (RecipeIngredientsAdmin,)
     empty_value_display = '-пусто-'
 
-    @admin.display(description='В избранном')
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            favorite_count=count_subquery(Favorite.objects.all(), 'recipe')
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Ищет по ингредиентам через EXISTS, без JOIN и DISTINCT.
+        """
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        condition = (
+            Q(name__icontains=search_term)
+            | Q(author__username__icontains=search_term)
+            | Q(Exists(AmountIngredient.objects.filter(
+                recipe=OuterRef('pk'),
+                ingredients__name__istartswith=search_term,
+            )))
+        )
+        if search_term.isdigit():
+            condition |= Q(cooking_time=int(search_term))
+        return queryset.filter(condition), False
+
+    @admin.display(description='В избранном', ordering='favorite_count')
     def favorite_counter(self, obj):
-        return obj.favorite.count()
+        return obj.favorite_count
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            change_counter('recipes_count', [obj.author_id])
+            enqueue(
+                fan_out_recipe, key=f'fan_out_recipe:{obj.id}',
+                recipe_id=obj.id
+            )
+        elif 'author' in form.changed_data:
+            change_counter('recipes_count', [form.initial['author']], -1)
+            change_counter('recipes_count', [obj.author_id])
+            # Рецепт уходит из лент подписчиков прежнего автора. Ключ
+            # fan_out_recipe:{id} уже занят задачей создания.
+            FeedEntry.objects.filter(recipe_id=obj.id).delete()
+            enqueue(fan_out_recipe, recipe_id=obj.id)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        refresh_snapshots([form.instance.id])
+        record(
+            'recipe', 'updated' if change else 'created',
+            recipe_id=form.instance.id,
+        )
+
+    def delete_model(self, request, obj):
+        soft_delete([obj.id])
+        enqueue(purge_deleted_recipes)
+
+    def delete_queryset(self, request, queryset):
+        soft_delete(queryset.values('id'))
+        enqueue(purge_deleted_recipes)
+
+
+@admin.register(ArchivedRecipe)
+class ArchivedRecipeAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'author', 'pub_date', 'archived_at',)
+    list_select_related = ('author',)
+    list_filter = (AuthorFilter,)
+    readonly_fields = ('author', 'pub_date', 'archived_at',)
+    actions = ('restore',)
+    empty_value_display = '-пусто-'
+
+    @admin.display(description='Название рецепта')
+    def name(self, obj):
+        return obj.data['name']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Вернуть из архива')
+    @transaction.atomic
+    def restore(self, request, queryset):
+        recipe_ids = restore_recipes(queryset.values_list('id', flat=True))
+        for recipe_id in recipe_ids:
+            enqueue(
+                fan_out_recipe, key=f'fan_out_recipe:{recipe_id}',
+                recipe_id=recipe_id
+            )
+        self.message_user(request, RESTORED.format(count=len(recipe_ids)))
 
 
 @admin.register(Tag)
-class TagAdmin(admin.ModelAdmin):
+class TagAdmin(RelatedRecipesAdmin):
     list_display = ('id', 'name', 'color', 'slug',)
     search_fields = ('name', 'slug',)
     empty_value_display = '-пусто-'
+    recipe_lookup = 'tags'
 
 
 @admin.register(Favorite)
 class FavoritesAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user',)
+    list_display = ('id', 'user', 'recipe',)
+    list_select_related = ('user', 'recipe',)
+    list_filter = (UserFilter,)
     empty_value_display = '-пусто-'
 
 
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user')
+    list_display = ('id', 'user', 'recipe', 'servings',)
+    list_select_related = ('user', 'recipe',)
+    list_filter = (UserFilter,)
     empty_value_display = '-пусто-'
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(RelatedRecipesAdmin):
     list_display = ('id', 'name', 'measurement_unit',)
-    search_fields = ('name',)
-    list_filter = ('name',)
+    search_fields = ('^name',)
+    list_filter = ('measurement_unit',)
     empty_value_display = '-пусто-'
+    recipe_lookup = 'ingredients'
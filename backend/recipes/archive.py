@@ -0,0 +1,282 @@
+from collections import defaultdict
+from itertools import islice
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from events.outbox import record_many
+from jobs.queue import enqueue
+from users.counters import change_counter
+from users.models import Follow, User
+from users.tasks import reconcile_counters
+
+from .models import (AmountIngredient, ArchivedRecipe, Favorite, Ingredient,
+                     Recipe, ShoppingCart, Tag)
+from .representations import get_recipes_data, get_value_fields
+from .snapshots import SNAPSHOT_FIELDS, refresh_snapshots
+
+PURGE_BATCH_SIZE = 100
+ARCHIVE_BATCH_SIZE = 500
+
+
+def get_image_name(url):
+    """
+    Имя файла картинки в хранилище по относительной ссылке из снимка.
+    """
+    storage = Recipe._meta.get_field('image').storage
+    if url and url.startswith(storage.base_url):
+        return url[len(storage.base_url):]
+    return url or ''
+
+
+def bump_collections_version(user_ids):
+    User.objects.filter(id__in=user_ids).update(
+        collections_version=F('collections_version') + 1
+    )
+
+
+def forget_recipes(recipes):
+    """
+    Уменьшает счетчики рецептов авторов и избранного пользователей.
+
+    Строки избранного блокируются, поэтому удаление из избранного,
+    начатое раньше, не вычитается второй раз. Избранное, которое
+    добавляют или удаляют одновременно с удалением рецепта, счетчик все
+    же может сдвинуть на единицу, поэтому вызывающий код ставит задачу
+    reconcile_counters для возвращенных id затронутых пользователей.
+    """
+    author_ids = [recipe['author_id'] for recipe in recipes]
+    user_ids = list(Favorite.objects.select_for_update().filter(
+        recipe_id__in=[recipe['id'] for recipe in recipes]
+    ).order_by('id').values_list('user_id', flat=True))
+    change_counter('recipes_count', author_ids, -1)
+    change_counter('favorites_count', user_ids, -1)
+    return sorted({*author_ids, *user_ids} - {None})
+
+
+@transaction.atomic
+def soft_delete(recipe_ids):
+    """
+    Помечает рецепты удаленными.
+
+    Рецепты сразу пропадают из выдачи, а строки в связанных таблицах
+    удаляет задача purge_deleted_recipes небольшими пачками.
+    """
+    recipes = list(Recipe.objects.select_for_update().filter(
+        id__in=recipe_ids
+    ).values('id', 'author_id'))
+    user_ids = forget_recipes(recipes)
+    now = timezone.now()
+    count = Recipe.objects.filter(
+        id__in=[recipe['id'] for recipe in recipes]
+    ).update(deleted_at=now, updated_at=now)
+    if user_ids:
+        enqueue(reconcile_counters, user_ids=user_ids)
+    record_many('recipe', 'deleted', [
+        {'recipe_id': recipe['id']} for recipe in recipes
+    ])
+    return count
+
+
+def purge_deleted_recipes(batch_size=PURGE_BATCH_SIZE):
+    """
+    Окончательно удаляет помеченные рецепты и возвращает их число.
+
+    Каждая пачка удаляется в своей короткой транзакции, чтобы не держать
+    блокировки на ингредиентах, избранном, корзинах и лентах.
+    """
+    count = 0
+    while True:
+        with transaction.atomic():
+            recipe_ids = list(Recipe.all_objects.filter(
+                deleted_at__isnull=False
+            ).select_for_update(skip_locked=True).values_list(
+                'id', flat=True
+            )[:batch_size])
+            if not recipe_ids:
+                return count
+            Recipe.all_objects.filter(id__in=recipe_ids).delete()
+        count += len(recipe_ids)
+
+
+def archive_batch(recipe_ids):
+    """
+    Переносит рецепты в архив и удаляет их из основных таблиц.
+
+    Вместе с рецептами удаляются строки избранного и корзин: списки
+    пользователей сохраняются в архиве и нужны только для флагов на
+    странице рецепта и для восстановления. Архивный рецепт пропадает из
+    избранного и списка покупок пользователей, пока его не восстановят.
+    """
+    # Блокировка рецептов не дает добавить их в избранное или корзину,
+    # пока строки переносятся в архив.
+    recipes = list(Recipe.objects.select_for_update().filter(
+        id__in=recipe_ids
+    ).values('id', 'author_id'))
+    recipe_ids = [recipe['id'] for recipe in recipes]
+    rows = Recipe.objects.filter(id__in=recipe_ids).values(
+        'pub_date', *get_value_fields(SNAPSHOT_FIELDS, AnonymousUser())
+    )
+    pub_dates = {row['id']: row['pub_date'] for row in rows}
+    favorited_by = defaultdict(list)
+    for recipe_id, user_id in Favorite.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'user_id').order_by('id'):
+        favorited_by[recipe_id].append(user_id)
+    shopping_carts = defaultdict(list)
+    for recipe_id, user_id, servings in ShoppingCart.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'user_id', 'servings').order_by('id'):
+        shopping_carts[recipe_id].append(
+            {'user_id': user_id, 'servings': servings}
+        )
+    ArchivedRecipe.objects.bulk_create([
+        ArchivedRecipe(
+            id=recipe['id'],
+            author_id=recipe['author'] and recipe['author']['id'],
+            pub_date=pub_dates[recipe['id']],
+            data=recipe,
+            favorited_by=favorited_by[recipe['id']],
+            shopping_carts=shopping_carts[recipe['id']],
+        ) for recipe in get_recipes_data(rows, None, SNAPSHOT_FIELDS)
+    ])
+    user_ids = forget_recipes(recipes)
+    Recipe.objects.filter(id__in=recipe_ids).delete()
+    bump_collections_version({
+        *(user_id for users in favorited_by.values() for user_id in users),
+        *(cart['user_id'] for carts in shopping_carts.values()
+          for cart in carts),
+    })
+    if user_ids:
+        enqueue(reconcile_counters, user_ids=user_ids)
+    record_many('recipe', 'archived', [
+        {'recipe_id': recipe_id} for recipe_id in recipe_ids
+    ])
+    return len(recipe_ids)
+
+
+def archive_recipes(published_before, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Переносит рецепты, опубликованные раньше published_before, в архив
+    и возвращает их число.
+    """
+    recipe_ids = Recipe.objects.filter(
+        pub_date__lt=published_before
+    ).order_by('id').values_list('id', flat=True).iterator(
+        chunk_size=batch_size
+    )
+    count = 0
+    while True:
+        batch = list(islice(recipe_ids, batch_size))
+        if not batch:
+            return count
+        with transaction.atomic():
+            count += archive_batch(batch)
+
+
+def restore_recipes(recipe_ids):
+    """
+    Возвращает рецепты из архива в основные таблицы с прежними id и
+    возвращает список этих id.
+
+    Тэги, ингредиенты, избранное и корзины восстанавливаются для тех
+    тэгов, ингредиентов и пользователей, что еще есть в базе.
+    """
+    archived = list(ArchivedRecipe.objects.select_for_update().filter(
+        id__in=recipe_ids
+    ).order_by('id'))
+    recipe_ids = [item.id for item in archived]
+    recipes = [
+        Recipe(
+            id=item.id,
+            author_id=item.author_id,
+            name=item.data['name'],
+            image=get_image_name(item.data['image']),
+            text=item.data['text'],
+            cooking_time=item.data['cooking_time'],
+        ) for item in archived
+    ]
+    Recipe.objects.bulk_create(recipes)
+    # auto_now_add перезаписывает дату при вставке.
+    for recipe, item in zip(recipes, archived):
+        recipe.pub_date = item.pub_date
+    Recipe.objects.bulk_update(recipes, ['pub_date'])
+    tag_ids = set(Tag.objects.filter(id__in={
+        tag['id'] for item in archived for tag in item.data['tags']
+    }).values_list('id', flat=True))
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=item.id, tag_id=tag['id'])
+        for item in archived for tag in item.data['tags']
+        if tag['id'] in tag_ids
+    )
+    ingredient_ids = set(Ingredient.objects.filter(id__in={
+        ingredient['id'] for item in archived
+        for ingredient in item.data['ingredients']
+    }).values_list('id', flat=True))
+    AmountIngredient.objects.bulk_create(
+        AmountIngredient(
+            recipe_id=item.id, ingredients_id=ingredient['id'],
+            amount=ingredient['amount'],
+        )
+        for item in archived for ingredient in item.data['ingredients']
+        if ingredient['id'] in ingredient_ids
+    )
+    user_ids = set(User.objects.filter(id__in={
+        *(user_id for item in archived for user_id in item.favorited_by),
+        *(cart['user_id'] for item in archived
+          for cart in item.shopping_carts),
+    }).values_list('id', flat=True))
+    favorites = [
+        Favorite(user_id=user_id, recipe_id=item.id)
+        for item in archived for user_id in item.favorited_by
+        if user_id in user_ids
+    ]
+    Favorite.objects.bulk_create(favorites)
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(
+            user_id=cart['user_id'], recipe_id=item.id,
+            servings=cart['servings'],
+        )
+        for item in archived for cart in item.shopping_carts
+        if cart['user_id'] in user_ids
+    )
+    change_counter('recipes_count', [item.author_id for item in archived])
+    change_counter(
+        'favorites_count', [favorite.user_id for favorite in favorites]
+    )
+    bump_collections_version(user_ids)
+    ArchivedRecipe.objects.filter(id__in=recipe_ids).delete()
+    refresh_snapshots(recipe_ids)
+    record_many('recipe', 'restored', [
+        {'recipe_id': recipe_id} for recipe_id in recipe_ids
+    ])
+    return recipe_ids
+
+
+def get_archived(recipe_id, user):
+    """
+    Строка архивного рецепта для render_snapshot: дата архивации,
+    представление и флаги текущего пользователя.
+
+    Подписка на автора проверяется в том же запросе. Возвращает None,
+    если рецепта нет в архиве.
+    """
+    queryset = ArchivedRecipe.objects.filter(id=recipe_id)
+    values = ['archived_at', 'data']
+    if user.is_authenticated:
+        queryset = queryset.annotate(is_subscribed=Exists(
+            Follow.objects.filter(user=user, author_id=OuterRef('author_id'))
+        ))
+        values += ['favorited_by', 'shopping_carts', 'is_subscribed']
+    row = queryset.values(*values).first()
+    if row is None:
+        return None
+    row['updated_at'] = row.pop('archived_at')
+    if user.is_authenticated:
+        row['is_favorited'] = user.id in row.pop('favorited_by')
+        row['is_in_shopping_cart'] = any(
+            cart['user_id'] == user.id for cart in row.pop('shopping_carts')
+        )
+    return row
@@ -0,0 +1,83 @@
+from django.db.models import BigIntegerField, Count, F, Max
+from django.db.models.functions import Cast
+
+from users.models import User
+
+from .models import AmountIngredient, ShoppingCart, ShoppingCartExport
+from .units import aggregate_ingredients, humanize_amount
+
+
+def get_cart_version(user):
+    """
+    Версия корзины пользователя или None, если корзина пуста.
+
+    Меняется вместе с версией коллекций пользователя и при изменении
+    рецептов из корзины.
+    """
+    stats = ShoppingCart.objects.filter(
+        user=user, recipe__deleted_at__isnull=True
+    ).aggregate(count=Count('id'), updated_at=Max('recipe__updated_at'))
+    if not stats['count']:
+        return None
+    return (
+        f'{user.collections_version}-{stats["updated_at"].timestamp():.6f}'
+    )
+
+
+def render_shopping_cart(user_id):
+    ingredients = aggregate_ingredients(
+        AmountIngredient.objects.filter(
+            recipe__shopping_cart__user_id=user_id,
+            recipe__deleted_at__isnull=True,
+        ),
+        amount=Cast('amount', BigIntegerField())
+        * F('recipe__shopping_cart__servings'),
+    )
+    text = 'Продукты к покупке:\n'
+    for ingredient in ingredients:
+        amount, unit = humanize_amount(
+            ingredient['value'], ingredient['unit']
+        )
+        text += f'- {ingredient["ingredients__name"]} - '
+        text += f'{amount} {unit}\n'
+    return text
+
+
+def get_shopping_cart_text(user, version):
+    """
+    Готовый список покупок для версии корзины или None.
+    """
+    return ShoppingCartExport.objects.filter(
+        user=user, version=version
+    ).values_list('text', flat=True).first()
+
+
+def save_shopping_cart_text(user, version, text):
+    """
+    Сохраняет список покупок, если корзина не изменилась, пока он
+    собирался.
+    """
+    user.refresh_from_db(fields=['collections_version'])
+    if get_cart_version(user) == version:
+        ShoppingCartExport.objects.update_or_create(
+            user=user, defaults={'version': version, 'text': text}
+        )
+
+
+def export_shopping_cart(user_id):
+    """
+    Сохраняет список покупок для текущей версии корзины.
+
+    Если корзина изменилась, пока список собирался, он не сохраняется:
+    его соберет задача, поставленная этим изменением.
+    """
+    user = User.objects.filter(id=user_id).only(
+        'id', 'collections_version'
+    ).first()
+    if user is None:
+        return
+    version = get_cart_version(user)
+    if version is None:
+        ShoppingCartExport.objects.filter(user=user).delete()
+        return
+    save_shopping_cart_text(user, version, render_shopping_cart(user_id))
@@ -0,0 +1,125 @@
+from itertools import islice
+
+from django.conf import settings
+
+from users.models import Follow, User
+
+from .models import FeedEntry, Recipe
+
+FANOUT_BATCH_SIZE = 1000
+
+
+def get_popular_author_ids(author_ids):
+    """
+    Авторы, у которых подписчиков больше FEED_FANOUT_LIMIT.
+
+    Их рецепты не раскладываются по лентам при публикации, а
+    подтягиваются при чтении ленты.
+    """
+    return set(User.objects.filter(
+        id__in=author_ids, followers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).values_list('id', flat=True))
+
+
+def fan_out_recipe(recipe_id):
+    """
+    Добавляет рецепт в ленты подписчиков автора.
+    """
+    recipe = Recipe.objects.filter(id=recipe_id).values(
+        'id', 'author_id', 'pub_date'
+    ).first()
+    if recipe is None or recipe['author_id'] in get_popular_author_ids(
+        [recipe['author_id']]
+    ):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=recipe['author_id']
+    ).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create([
+        FeedEntry(
+            user_id=user_id, recipe_id=recipe['id'],
+            pub_date=recipe['pub_date'],
+        ) for user_id in follower_ids
+    ], batch_size=FANOUT_BATCH_SIZE, ignore_conflicts=True)
+
+
+def is_leaving_popular(author_id):
+    """
+    Проверяет, что после отписки у автора ровно FEED_FANOUT_LIMIT
+    подписчиков, то есть он только что перестал быть популярным.
+    """
+    return User.objects.filter(
+        id=author_id, followers_count=settings.FEED_FANOUT_LIMIT
+    ).exists()
+
+
+def fan_out_author(author_id):
+    """
+    Раскладывает последние рецепты автора по лентам всех подписчиков.
+
+    Рецепты, опубликованные, пока автор был популярным, в ленты не
+    попадали и подтягивались при чтении; когда он перестает быть
+    популярным, они должны появиться в предрассчитанных лентах.
+    """
+    if author_id in get_popular_author_ids([author_id]):
+        return
+    recipes = list(Recipe.objects.filter(author_id=author_id).values_list(
+        'id', 'pub_date'
+    )[:settings.FEED_BACKFILL_SIZE])
+    follower_ids = Follow.objects.filter(
+        author_id=author_id
+    ).order_by('id').values_list('user_id', flat=True).iterator(
+        chunk_size=FANOUT_BATCH_SIZE
+    )
+    while True:
+        batch = list(islice(follower_ids, FANOUT_BATCH_SIZE))
+        if not batch:
+            return
+        FeedEntry.objects.bulk_create([
+            FeedEntry(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+            for user_id in batch
+            for recipe_id, pub_date in recipes
+        ], batch_size=FANOUT_BATCH_SIZE, ignore_conflicts=True)
+
+
+def backfill_feed(user_id, author_id):
+    """
+    Добавляет в ленту последние рецепты автора после подписки.
+    """
+    if author_id in get_popular_author_ids([author_id]):
+        return
+    recipes = Recipe.objects.filter(author_id=author_id).values_list(
+        'id', 'pub_date'
+    )[:settings.FEED_BACKFILL_SIZE]
+    FeedEntry.objects.bulk_create([
+        FeedEntry(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+        for recipe_id, pub_date in recipes
+    ], ignore_conflicts=True)
+
+
+def remove_from_feed(user_id, author_id):
+    FeedEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author_id
+    ).delete()
+
+
+def get_feed(user, queryset):
+    """
+    Записи ленты пользователя (recipe_id, pub_date) из queryset рецептов,
+    от новых к старым.
+
+    Рецепты обычных авторов берутся из предрассчитанной ленты по индексу
+    (user, -pub_date), рецепты популярных авторов - напрямую по
+    подписке. Сами рецепты загружаются потом только для страницы.
+    """
+    entries = FeedEntry.objects.filter(
+        user=user, recipe__in=queryset.values('id')
+    ).order_by().values('recipe_id', 'pub_date')
+    popular_author_ids = get_popular_author_ids(
+        Follow.objects.filter(user=user).values('author_id')
+    )
+    if popular_author_ids:
+        entries = entries.union(queryset.filter(
+            author_id__in=popular_author_ids
+        ).order_by().values('id', 'pub_date'))
+    return entries.order_by('-pub_date', '-recipe_id')
@@ -0,0 +1,71 @@
+"""
+Пережатие картинок рецептов.
+
+Pillow импортируется внутри функции: модуль нужен только воркеру
+фоновых задач.
+"""
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from events.outbox import record
+
+from .models import Recipe
+from .snapshots import refresh_snapshots
+
+MAX_IMAGE_SIZE = (1280, 1280)
+JPEG_QUALITY = 85
+BACKGROUND = (255, 255, 255)
+
+
+def encode_jpeg(file):
+    """
+    Уменьшает картинку до MAX_IMAGE_SIZE и кодирует ее в JPEG без
+    метаданных. Прозрачные области заливаются белым.
+    """
+    from PIL import Image, ImageOps
+
+    image = ImageOps.exif_transpose(Image.open(file))
+    image.thumbnail(MAX_IMAGE_SIZE)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, BACKGROUND)
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    buffer = BytesIO()
+    image.convert('RGB').save(
+        buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True,
+        progressive=True,
+    )
+    return buffer.getvalue()
+
+
+def reencode_image(recipe_id, name):
+    """
+    Заменяет загруженную картинку рецепта пережатой копией.
+
+    Если картинку рецепта успели сменить, новый файл удаляется. Старый
+    файл удаляется, только если на него не ссылаются другие рецепты.
+    """
+    if not default_storage.exists(name):
+        return
+    with default_storage.open(name) as file:
+        content = encode_jpeg(file)
+    new_name = default_storage.save(
+        f'{os.path.splitext(name)[0]}.jpg', ContentFile(content)
+    )
+    with transaction.atomic():
+        replaced = Recipe.all_objects.filter(id=recipe_id, image=name).update(
+            image=new_name, updated_at=timezone.now()
+        )
+        if replaced:
+            refresh_snapshots([recipe_id])
+            record('recipe', 'updated', recipe_id=recipe_id)
+    if not replaced:
+        default_storage.delete(new_name)
+    elif not Recipe.all_objects.filter(image=name).exists():
+        default_storage.delete(name)
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from recipes.archive import archive_recipes, purge_deleted_recipes
+
+
+class Command(BaseCommand):
+    help = ('Переносит старые рецепты в архив и удаляет помеченные '
+            'удаленными')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=3 * 365,
+                            help='архивировать рецепты старше N дней')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        purged = purge_deleted_recipes()
+        archived = archive_recipes(
+            timezone.now() - timedelta(days=options['days']),
+            options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено рецептов: {purged}, перенесено в архив: {archived}'
+        ))
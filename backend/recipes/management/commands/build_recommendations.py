@@ -0,0 +1,32 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes.models import RecipeSimilarity, UserRecommendation
+from recipes.recommendations import (iter_recommendations, iter_similarities,
+                                     replace_all)
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает похожие рецепты и рекомендации пользователям'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=20,
+                            help='сколько рецептов сохранять на строку')
+        parser.add_argument('--block-size', type=int, default=256,
+                            help='наибольшее число строк матрицы сходства '
+                                 'за один шаг')
+
+    def handle(self, *args, **options):
+        top_k, block_size = options['top_k'], options['block_size']
+        with transaction.atomic():
+            similarities = replace_all(
+                RecipeSimilarity, iter_similarities(top_k, block_size)
+            )
+        with transaction.atomic():
+            recommendations = replace_all(
+                UserRecommendation, iter_recommendations(top_k, block_size)
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Похожих рецептов: {similarities}, '
+            f'рекомендаций: {recommendations}'
+        ))
@@ -0,0 +1,185 @@
+import json
+import tarfile
+import tempfile
+from collections import defaultdict
+from itertools import chain
+
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand
+from django.db.models import Exists, OuterRef
+
+from recipes.archive import get_image_name
+from recipes.management.commands.generate_data import batched
+from recipes.models import (AmountIngredient, ArchivedRecipe, Ingredient,
+                            Recipe, Tag)
+from users.models import User
+
+MEDIA_PREFIX = 'media/'
+USER_VALUES = (
+    'username', 'email', 'first_name', 'last_name', 'password',
+    'date_joined',
+)
+RECIPE_VALUES = (
+    'id', 'author__username', 'name', 'image', 'text', 'cooking_time',
+    'pub_date',
+)
+ARCHIVED_VALUES = (
+    'id', 'author__username', 'pub_date', 'archived_at', 'data',
+    'favorited_by', 'shopping_carts',
+)
+
+
+def get_archive_mode(path, mode):
+    if path.endswith(('.gz', '.tgz')):
+        return f'{mode}:gz'
+    return mode
+
+
+class Command(BaseCommand):
+    help = 'Выгружает рецепты с авторами, тэгами и картинками в архив'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='файл архива, .tar или .tar.gz')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def add_lines(self, archive, name, rows):
+        """
+        Пишет строки NDJSON во временный файл и добавляет его в архив.
+        """
+        count = 0
+        with tempfile.TemporaryFile() as file:
+            for row in rows:
+                # str() сохраняет микросекунды в датах.
+                file.write(json.dumps(
+                    row, default=str, ensure_ascii=False
+                ).encode())
+                file.write(b'\n')
+                count += 1
+            info = tarfile.TarInfo(name)
+            info.size = file.tell()
+            file.seek(0)
+            archive.addfile(info, file)
+        return count
+
+    def add_image(self, archive, name):
+        if not default_storage.exists(name):
+            self.stderr.write(f'Нет файла картинки: {name}')
+            return False
+        info = tarfile.TarInfo(MEDIA_PREFIX + name)
+        info.size = default_storage.size(name)
+        with default_storage.open(name) as file:
+            archive.addfile(info, file)
+        return True
+
+    def add_images(self, archive):
+        """
+        Добавляет картинки рецептов и архивных рецептов отдельным
+        проходом после строк.
+
+        Повторы внутри таблицы убирает DISTINCT в базе, так что имена
+        не копятся в памяти. Картинка, общая для рецепта и архивного
+        рецепта, попадет в архив дважды под одним именем; import_recipes
+        загружает ее один раз.
+        """
+        names = (
+            Recipe.objects.exclude(image='').values_list(
+                'image', flat=True
+            ).distinct().order_by().iterator(chunk_size=self.batch_size),
+            (
+                get_image_name(url) for url in
+                ArchivedRecipe.objects.values_list(
+                    'data__image', flat=True
+                ).distinct().order_by().iterator(chunk_size=self.batch_size)
+                if url
+            ),
+        )
+        return sum(self.add_image(archive, name) for name in chain(*names))
+
+    def get_recipes(self):
+        rows = Recipe.objects.values(*RECIPE_VALUES).order_by('id').iterator(
+            chunk_size=self.batch_size
+        )
+        for batch in batched(rows, self.batch_size):
+            recipe_ids = [row['id'] for row in batch]
+            tags = defaultdict(list)
+            for recipe_id, slug in Recipe.tags.through.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values_list('recipe_id', 'tag__slug').order_by('id'):
+                tags[recipe_id].append(slug)
+            ingredients = defaultdict(list)
+            for recipe_id, ingredient_id, amount in (
+                AmountIngredient.objects.filter(
+                    recipe_id__in=recipe_ids
+                ).values_list(
+                    'recipe_id', 'ingredients_id', 'amount'
+                ).order_by('id')
+            ):
+                ingredients[recipe_id].append((ingredient_id, amount))
+            for row in batch:
+                row['author'] = row.pop('author__username')
+                row['tags'] = tags[row['id']]
+                row['ingredients'] = ingredients[row['id']]
+                yield row
+
+    def get_archived(self):
+        """
+        Архивные рецепты; пользователи в избранном и корзинах выгружаются
+        по username.
+        """
+        rows = ArchivedRecipe.objects.values(*ARCHIVED_VALUES).order_by(
+            'id'
+        ).iterator(chunk_size=self.batch_size)
+        for batch in batched(rows, self.batch_size):
+            usernames = dict(User.objects.filter(id__in={
+                *(user_id for row in batch for user_id in row['favorited_by']),
+                *(cart['user_id'] for row in batch
+                  for cart in row['shopping_carts']),
+            }).values_list('id', 'username'))
+            for row in batch:
+                row['author'] = row.pop('author__username')
+                row['favorited_by'] = [
+                    usernames[user_id] for user_id in row['favorited_by']
+                    if user_id in usernames
+                ]
+                row['shopping_carts'] = [
+                    {'user': usernames[cart['user_id']],
+                     'servings': cart['servings']}
+                    for cart in row['shopping_carts']
+                    if cart['user_id'] in usernames
+                ]
+                yield row
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        path = options['path']
+        authors = User.objects.filter(
+            Exists(Recipe.objects.filter(author=OuterRef('pk')))
+            | Exists(ArchivedRecipe.objects.filter(author=OuterRef('pk')))
+        ).values(*USER_VALUES).order_by('id')
+        with tarfile.open(path, get_archive_mode(path, 'w')) as archive:
+            counts = {
+                'тэгов': self.add_lines(
+                    archive, 'tags.ndjson',
+                    Tag.objects.values('name', 'color', 'slug')
+                ),
+                'ингредиентов': self.add_lines(
+                    archive, 'ingredients.ndjson',
+                    Ingredient.objects.values(
+                        'id', 'name', 'measurement_unit'
+                    ).iterator(chunk_size=self.batch_size)
+                ),
+                'авторов': self.add_lines(
+                    archive, 'users.ndjson',
+                    authors.iterator(chunk_size=self.batch_size)
+                ),
+                'рецептов': self.add_lines(
+                    archive, 'recipes.ndjson', self.get_recipes()
+                ),
+                'архивных рецептов': self.add_lines(
+                    archive, 'archived.ndjson', self.get_archived()
+                ),
+                'картинок': self.add_images(archive),
+            }
+        self.stdout.write(self.style.SUCCESS('Выгружено ' + ', '.join(
+            f'{name}: {count}' for name, count in counts.items()
+        )))
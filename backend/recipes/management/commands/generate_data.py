@@ -0,0 +1,168 @@
+import base64
+import random
+import uuid
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+
+from recipes.models import (AmountIngredient, Favorite, Ingredient, Recipe,
+                            ShoppingCart, Tag)
+from users.counters import reconcile_counters
+from users.models import Follow, User
+
+IMAGE_NAME = 'recipe/generated.png'
+IMAGE = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwAD'
+    'hgGAWjR9awAAAABJRU5ErkJggg=='
+)
+PASSWORD = 'generated-password'
+USERS_CONFLICT = ('Пользователи с префиксом {prefix} уже есть: '
+                  'создано {created} из {count}')
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу синтетическими пользователями и рецептами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--follows', type=int, default=10,
+                            help='подписок на пользователя')
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='избранных рецептов на пользователя')
+        parser.add_argument('--carts', type=int, default=5,
+                            help='рецептов в корзине на пользователя')
+        parser.add_argument('--ingredients', type=int, default=8,
+                            help='ингредиентов в рецепте')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix',
+                            help='префикс имен пользователей, по умолчанию '
+                                 'случайный для каждого запуска')
+
+    def insert(self, model, objs):
+        for batch in batched(objs, self.batch_size):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def bulk_create(self, model, objs):
+        """
+        Вставляет объекты пачками и возвращает id новых строк.
+        """
+        last_id = model.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        self.insert(model, objs)
+        return list(model.objects.filter(
+            id__gt=last_id
+        ).order_by('id').values_list('id', flat=True))
+
+    def create_users(self, count, prefix):
+        password = make_password(PASSWORD)
+        user_ids = self.bulk_create(User, (
+            User(
+                username=f'{prefix}{number}',
+                email=f'{prefix}{number}@example.com',
+                first_name=f'Имя{number}',
+                last_name=f'Фамилия{number}',
+                password=password,
+            ) for number in range(count)
+        ))
+        # Конфликтующие строки ignore_conflicts пропускает молча.
+        if len(user_ids) != count:
+            raise CommandError(USERS_CONFLICT.format(
+                prefix=prefix, created=len(user_ids), count=count
+            ))
+        return user_ids
+
+    def create_recipes(self, count, author_ids, tag_ids, ingredient_ids,
+                       per_recipe):
+        if not default_storage.exists(IMAGE_NAME):
+            default_storage.save(IMAGE_NAME, ContentFile(IMAGE))
+        recipe_ids = self.bulk_create(Recipe, (
+            Recipe(
+                author_id=self.random.choice(author_ids),
+                name=f'Рецепт {number}',
+                image=IMAGE_NAME,
+                text=f'Описание рецепта {number}. ' * 5,
+                cooking_time=self.random.randint(5, 180),
+            ) for number in range(count)
+        ))
+        per_recipe = min(per_recipe, len(ingredient_ids))
+        self.insert(AmountIngredient, (
+            AmountIngredient(
+                recipe_id=recipe_id,
+                ingredients_id=ingredient_id,
+                amount=self.random.randint(1, 500),
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in self.random.sample(
+                ingredient_ids, per_recipe
+            )
+        ))
+        through = Recipe.tags.through
+        self.insert(through, (
+            through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in self.random.sample(
+                tag_ids, self.random.randint(1, len(tag_ids))
+            )
+        ))
+        return recipe_ids
+
+    def create_links(self, model, field, user_ids, target_ids, per_user):
+        per_user = min(per_user, len(target_ids) - 1)
+        if per_user <= 0:
+            return
+        self.insert(model, (
+            model(user_id=user_id, **{f'{field}_id': target_id})
+            for user_id in user_ids
+            for target_id in self.random.sample(target_ids, per_user)
+            if target_id != user_id or model is not Follow
+        ))
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if options['recipes'] and (not tag_ids or not ingredient_ids):
+            raise CommandError(
+                'Сначала загрузите тэги и ингредиенты: '
+                'tags_import и ingredients_import'
+            )
+        prefix = options['prefix'] or f'user_{uuid.uuid4().hex[:8]}_'
+        user_ids = self.create_users(options['users'], prefix)
+        if not user_ids:
+            raise CommandError('Нужен хотя бы один пользователь')
+        recipe_ids = self.create_recipes(
+            options['recipes'], user_ids, tag_ids, ingredient_ids,
+            options['ingredients'],
+        )
+        self.create_links(
+            Follow, 'author', user_ids, user_ids, options['follows']
+        )
+        self.create_links(
+            Favorite, 'recipe', user_ids, recipe_ids, options['favorites']
+        )
+        self.create_links(
+            ShoppingCart, 'recipe', user_ids, recipe_ids, options['carts']
+        )
+        reconcile_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(user_ids)}, '
+            f'рецептов: {len(recipe_ids)}. Имена: {prefix}N, '
+            f'пароль: {PASSWORD}'
+        ))
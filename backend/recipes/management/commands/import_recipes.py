@@ -0,0 +1,263 @@
+import json
+import tarfile
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+
+from recipes.management.commands.export_recipes import MEDIA_PREFIX
+from recipes.management.commands.generate_data import batched
+from recipes.models import (AmountIngredient, ArchivedRecipe, Ingredient,
+                            Recipe, Tag)
+from users.counters import reconcile_counters
+from users.models import User
+
+USERS_DROPPED = ('Не загружены пользователи (email занят другим '
+                 'пользователем): {usernames}. Их рецепты остались бы без '
+                 'автора; загруженные пачки сохранены, архив можно '
+                 'загрузить повторно после исправления конфликтов')
+DROPPED_SHOWN = 20
+
+
+def read_lines(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+class Command(BaseCommand):
+    help = 'Загружает рецепты из архива, созданного export_recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='файл архива, .tar или .tar.gz')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def import_tags(self, rows):
+        Tag.objects.bulk_create(
+            (Tag(**row) for row in rows), ignore_conflicts=True
+        )
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+
+    def import_ingredients(self, rows):
+        existing = {
+            (name, unit): ingredient_id
+            for ingredient_id, name, unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        }
+        rows = list(rows)
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in {
+                (row['name'], row['measurement_unit']) for row in rows
+            } - existing.keys()
+        )
+        existing = {
+            (name, unit): ingredient_id
+            for ingredient_id, name, unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        }
+        self.ingredients = {
+            row['id']: existing[row['name'], row['measurement_unit']]
+            for row in rows
+        }
+
+    def import_users(self, rows):
+        """
+        Создает авторов; пользователи с уже занятым username не создаются,
+        рецепты достаются существующему пользователю.
+
+        Строки, которые ignore_conflicts пропустил из-за другого
+        конфликта (занятого email), ищутся после вставки, и импорт
+        останавливается до загрузки рецептов.
+        """
+        dropped = []
+        for batch in batched(rows, self.batch_size):
+            with transaction.atomic():
+                User.objects.bulk_create(
+                    (User(**row) for row in batch), ignore_conflicts=True
+                )
+            usernames = {row['username'] for row in batch}
+            dropped += sorted(usernames - set(User.objects.filter(
+                username__in=usernames
+            ).values_list('username', flat=True)))
+        if dropped:
+            raise CommandError(USERS_DROPPED.format(usernames=', '.join(
+                dropped[:DROPPED_SHOWN]
+                + ([f'... всего {len(dropped)}']
+                   if len(dropped) > DROPPED_SHOWN else [])
+            )))
+
+    def import_image(self, archive, member):
+        name = member.name[len(MEDIA_PREFIX):]
+        if default_storage.exists(name):
+            return
+        with archive.extractfile(member) as file:
+            default_storage.save(name, File(file, name))
+
+    def create_recipes(self, recipes):
+        """
+        Вставляет рецепты и проставляет им новые id.
+
+        Если база не возвращает id из bulk_create (SQLite), они берутся
+        по возрастанию после максимального id до вставки; пачка
+        вставляется в одной транзакции.
+        """
+        last_id = Recipe.all_objects.aggregate(last_id=Max('id'))['last_id']
+        Recipe.objects.bulk_create(recipes)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            new_ids = Recipe.all_objects.filter(
+                id__gt=last_id or 0
+            ).order_by('id').values_list('id', flat=True)
+            for recipe, recipe_id in zip(recipes, new_ids):
+                recipe.id = recipe_id
+
+    def import_recipes(self, rows):
+        for batch in batched(rows, self.batch_size):
+            with transaction.atomic():
+                self.import_recipes_batch(batch)
+            self.count += len(batch)
+
+    def import_recipes_batch(self, batch):
+        authors = dict(User.objects.filter(
+            username__in={row['author'] for row in batch}
+        ).values_list('username', 'id'))
+        recipes = [
+            Recipe(
+                author_id=authors.get(row['author']),
+                name=row['name'],
+                image=row['image'],
+                text=row['text'],
+                cooking_time=row['cooking_time'],
+            ) for row in batch
+        ]
+        self.create_recipes(recipes)
+        # auto_now_add перезаписывает дату при вставке.
+        for recipe, row in zip(recipes, batch):
+            recipe.pub_date = row['pub_date']
+        Recipe.objects.bulk_update(recipes, ['pub_date'])
+        through = Recipe.tags.through
+        through.objects.bulk_create(
+            through(recipe_id=recipe.id, tag_id=self.tags[slug])
+            for recipe, row in zip(recipes, batch)
+            for slug in row['tags'] if slug in self.tags
+        )
+        AmountIngredient.objects.bulk_create(
+            AmountIngredient(
+                recipe_id=recipe.id,
+                ingredients_id=self.ingredients[ingredient_id],
+                amount=amount,
+            )
+            for recipe, row in zip(recipes, batch)
+            for ingredient_id, amount in row['ingredients']
+            if ingredient_id in self.ingredients
+        )
+
+    def reserve_ids(self, count):
+        """
+        Берет count новых id из последовательности рецептов: вставляет
+        пустые рецепты и сразу их удаляет.
+
+        Архивный рецепт отвечает по тому же адресу, что и обычный,
+        поэтому его id не должен достаться рецепту, созданному позже.
+        """
+        recipes = [
+            Recipe(name='', image='', text='', cooking_time=1)
+            for _ in range(count)
+        ]
+        self.create_recipes(recipes)
+        recipe_ids = [recipe.id for recipe in recipes]
+        Recipe.all_objects.filter(id__in=recipe_ids).delete()
+        return recipe_ids
+
+    def import_archived(self, rows):
+        """
+        Загружает архивные рецепты с новыми id.
+
+        Избранное и корзины сохраняются для пользователей, которые есть
+        в базе, тэги и ингредиенты в представлении получают id этой базы.
+        """
+        for batch in batched(rows, self.batch_size):
+            with transaction.atomic():
+                self.import_archived_batch(batch)
+            self.archived_count += len(batch)
+
+    def import_archived_batch(self, batch):
+        users = dict(User.objects.filter(username__in={
+            *(row['author'] for row in batch),
+            *(name for row in batch for name in row['favorited_by']),
+            *(cart['user'] for row in batch
+              for cart in row['shopping_carts']),
+        }).values_list('username', 'id'))
+        archived = []
+        for recipe_id, row in zip(self.reserve_ids(len(batch)), batch):
+            data = row['data']
+            data['id'] = recipe_id
+            author_id = users.get(row['author'])
+            if author_id is None:
+                data['author'] = None
+            else:
+                data['author']['id'] = author_id
+            for tag in data['tags']:
+                tag['id'] = self.tags.get(tag['slug'], tag['id'])
+            for ingredient in data['ingredients']:
+                ingredient['id'] = self.ingredients.get(
+                    ingredient['id'], ingredient['id']
+                )
+            archived.append(ArchivedRecipe(
+                id=recipe_id,
+                author_id=author_id,
+                pub_date=row['pub_date'],
+                data=data,
+                favorited_by=[
+                    users[name] for name in row['favorited_by']
+                    if name in users
+                ],
+                shopping_carts=[
+                    {'user_id': users[cart['user']],
+                     'servings': cart['servings']}
+                    for cart in row['shopping_carts']
+                    if cart['user'] in users
+                ],
+            ))
+        ArchivedRecipe.objects.bulk_create(archived)
+        # auto_now_add перезаписывает дату при вставке.
+        for item, row in zip(archived, batch):
+            item.archived_at = row['archived_at']
+        ArchivedRecipe.objects.bulk_update(archived, ['archived_at'])
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.tags = {}
+        self.ingredients = {}
+        self.count = 0
+        self.archived_count = 0
+        handlers = {
+            'tags.ndjson': self.import_tags,
+            'ingredients.ndjson': self.import_ingredients,
+            'users.ndjson': self.import_users,
+            'recipes.ndjson': self.import_recipes,
+            'archived.ndjson': self.import_archived,
+        }
+        try:
+            archive = tarfile.open(options['path'], 'r:*')
+        except (OSError, tarfile.TarError) as error:
+            raise CommandError(f'Не удалось открыть архив: {error}')
+        with archive:
+            for member in archive:
+                if member.name.startswith(MEDIA_PREFIX):
+                    self.import_image(archive, member)
+                    continue
+                if member.name in handlers:
+                    with archive.extractfile(member) as file:
+                        handlers[member.name](read_lines(file))
+        reconcile_counters()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Загружено рецептов: {self.count}, '
+                f'архивных рецептов: {self.archived_count}'
+            )
+        )
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.15 on 2026-10-19 09:57
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_feedentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='servings',
+            field=models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1, message='Рецепт нужно приготовить хотя бы 1 раз')], verbose_name='Сколько раз приготовить'),
+        ),
+    ]
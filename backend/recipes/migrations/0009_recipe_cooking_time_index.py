@@ -0,0 +1,19 @@
+# Generated by Django 3.2.15 on 2026-10-19 10:12
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='cooking_time',
+            field=models.PositiveIntegerField(db_index=True, validators=[django.core.validators.MinValueValidator(1, message='Время готовки не может быть меньше 1 минуты')], verbose_name='Время приготовления (в минутах)'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 3.2.15 on 2026-10-19 10:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0009_recipe_cooking_time_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedRecipe',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации рецепта')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата архивации')),
+                ('data', models.JSONField(verbose_name='Представление рецепта')),
+                ('favorited_by', models.JSONField(default=list, verbose_name='Добавили в избранное')),
+                ('shopping_carts', models.JSONField(default=list, verbose_name='Корзины')),
+            ],
+            options={
+                'verbose_name': 'Архивный рецепт',
+                'verbose_name_plural': 'Архив рецептов',
+                'ordering': ['-pub_date'],
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Дата удаления рецепта'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['-pub_date'], name='recipe_live_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['deleted_at'], name='recipe_deleted_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedrecipe',
+            name='author',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_recipes', to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.15 on 2026-10-19 10:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_user_counters'),
+        ('recipes', '0010_recipe_soft_delete_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartExport',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='shopping_cart_export', serialize=False, to='users.user', verbose_name='Пользователь')),
+                ('version', models.CharField(max_length=64, verbose_name='Версия корзины')),
+                ('text', models.TextField(verbose_name='Список покупок')),
+            ],
+            options={
+                'verbose_name': 'Готовый список покупок',
+                'verbose_name_plural': 'Готовые списки покупок',
+            },
+        ),
+    ]
@@ -6,6 +6,7 @@ from users.models import User
 VALID_TAG_SLUG = 'Введите корректное значение поля "slug"'
 MINIMUM_COOKING_TIME = 'Время готовки не может быть меньше 1 минуты'
 MINIMUM_OF_INGREDIENTS = 'Нужно добавить как минимум 1 ингредиент'
+MINIMUM_SERVINGS = 'Рецепт нужно приготовить хотя бы 1 раз'
 
 
 class Ingredient(models.Model):
@@ -58,6 +59,14 @@ class Tag(models.Model):
         return self.name[:15]
 
 
+class RecipeManager(models.Manager):
+    """
+    Менеджер без удаленных рецептов.
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User,
@@ -90,6 +99,7 @@ class Recipe(models.Model):
     )
     cooking_time = models.PositiveIntegerField(
         'Время приготовления (в минутах)',
+        db_index=True,
         validators=[
             MinValueValidator(
                 1, message=MINIMUM_COOKING_TIME
@@ -100,11 +110,37 @@ class Recipe(models.Model):
         'Дата публикации рецепта',
         auto_now_add=True,
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения рецепта',
+        auto_now=True,
+        db_index=True,
+    )
+    deleted_at = models.DateTimeField(
+        'Дата удаления рецепта',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
+    objects = RecipeManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ['-pub_date', ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date'],
+                condition=models.Q(deleted_at__isnull=True),
+                name='recipe_live_pub_date_idx',
+            ),
+            models.Index(
+                fields=['deleted_at'],
+                condition=models.Q(deleted_at__isnull=False),
+                name='recipe_deleted_at_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name[:15]
@@ -184,6 +220,15 @@ class ShoppingCart(models.Model):
         on_delete=models.CASCADE,
         related_name='shopping_cart',
     )
+    servings = models.PositiveSmallIntegerField(
+        'Сколько раз приготовить',
+        default=1,
+        validators=[
+            MinValueValidator(
+                1, message=MINIMUM_SERVINGS
+            ),
+        ]
+    )
 
     class Meta:
         verbose_name = 'Корзина'
@@ -194,3 +239,193 @@ class ShoppingCart(models.Model):
                 name='unique_shoppinglist_recipe_user',
             ),
         ]
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='feed',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    pub_date = models.DateTimeField(
+        'Дата публикации рецепта',
+    )
+
+    class Meta:
+        ordering = ['-pub_date', ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_user_recipe',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date'],
+                name='feed_user_pub_date_idx',
+            ),
+        ]
+
+
+class RecipeSnapshot(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='snapshot',
+    )
+    data = models.JSONField(
+        'Представление рецепта',
+    )
+    updated_at = models.DateTimeField(
+        'Дата обновления',
+        auto_now=True,
+    )
+
+    class Meta:
+        verbose_name = 'Снимок рецепта'
+        verbose_name_plural = 'Снимки рецептов'
+
+
+class ShoppingCartExport(models.Model):
+    user = models.OneToOneField(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='shopping_cart_export',
+    )
+    version = models.CharField(
+        'Версия корзины',
+        max_length=64,
+    )
+    text = models.TextField(
+        'Список покупок',
+    )
+
+    class Meta:
+        verbose_name = 'Готовый список покупок'
+        verbose_name_plural = 'Готовые списки покупок'
+
+
+class RecipeSimilarity(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='similarities',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        verbose_name='Похожий рецепт',
+        on_delete=models.CASCADE,
+        related_name='similar_for',
+    )
+    score = models.FloatField(
+        'Сходство',
+    )
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='unique_similarity_recipe_similar',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'],
+                name='similarity_recipe_score_idx',
+            ),
+        ]
+
+
+class UserRecommendation(models.Model):
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='recommendations',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='recommended_to',
+    )
+    score = models.FloatField(
+        'Оценка',
+    )
+
+    class Meta:
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_recommendation_user_recipe',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-score'],
+                name='recommendation_user_score_idx',
+            ),
+        ]
+
+
+class ArchivedRecipe(models.Model):
+    """
+    Рецепт, перенесенный из основных таблиц командой archive_recipes.
+
+    Тэги и ингредиенты хранятся в data в виде снимка, избранное и
+    корзины - списками пользователей.
+    """
+    id = models.BigIntegerField(
+        primary_key=True,
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_recipes',
+        verbose_name='Автор',
+        null=True,
+    )
+    pub_date = models.DateTimeField(
+        'Дата публикации рецепта',
+    )
+    archived_at = models.DateTimeField(
+        'Дата архивации',
+        auto_now_add=True,
+    )
+    data = models.JSONField(
+        'Представление рецепта',
+    )
+    favorited_by = models.JSONField(
+        'Добавили в избранное',
+        default=list,
+    )
+    shopping_carts = models.JSONField(
+        'Корзины',
+        default=list,
+    )
+
+    class Meta:
+        ordering = ['-pub_date', ]
+        verbose_name = 'Архивный рецепт'
+        verbose_name_plural = 'Архив рецептов'
+
+    def __str__(self):
+        return self.data['name'][:15]
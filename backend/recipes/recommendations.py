@@ -0,0 +1,162 @@
+"""
+Расчет похожих рецептов и персональных рекомендаций.
+
+Модуль импортирует NumPy и SciPy, поэтому используется только командой
+build_recommendations и не загружается веб-процессами.
+"""
+from itertools import islice
+
+import numpy as np
+from scipy import sparse
+
+from .models import (AmountIngredient, Favorite, Recipe, RecipeSimilarity,
+                     UserRecommendation)
+
+INSERT_BATCH_SIZE = 5000
+# Оценки блока остаются разреженными, но строки почти плотные, если у
+# рецептов есть общий популярный тэг: размер блока ограничен и по ячейкам.
+MAX_BLOCK_CELLS = 2 ** 22
+
+
+def get_pairs(queryset, *fields):
+    pairs = np.array(list(queryset.values_list(*fields)), dtype=np.int64)
+    return pairs.reshape(-1, 2)
+
+
+def normalize_rows(matrix):
+    """
+    Делит строки разреженной матрицы на их L2-норму.
+    """
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)))
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms.ravel()) @ matrix
+
+
+def get_recipe_features(recipe_ids):
+    """
+    Матрица рецепт x (ингредиенты + тэги) с весами IDF.
+
+    Редкие ингредиенты весят больше, чем соль или популярный тэг.
+    """
+    live = Recipe.objects.values('id')
+    ingredients = get_pairs(AmountIngredient.objects.filter(recipe__in=live),
+                            'recipe_id', 'ingredients_id')
+    tags = get_pairs(Recipe.tags.through.objects.filter(recipe__in=live),
+                     'recipe_id', 'tag_id')
+    _, ingredient_columns = np.unique(ingredients[:, 1], return_inverse=True)
+    _, tag_columns = np.unique(tags[:, 1], return_inverse=True)
+    tag_offset = ingredient_columns.max(initial=-1) + 1
+    columns = np.concatenate((ingredient_columns, tag_columns + tag_offset))
+    rows = np.searchsorted(
+        recipe_ids, np.concatenate((ingredients[:, 0], tags[:, 0]))
+    )
+    features = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, columns)),
+        shape=(len(recipe_ids), columns.max(initial=-1) + 1),
+    )
+    features.data[:] = 1
+    document_frequency = np.bincount(features.indices,
+                                     minlength=features.shape[1])
+    idf = np.log(len(recipe_ids) / np.maximum(document_frequency, 1)) + 1
+    return normalize_rows(features @ sparse.diags(idf.astype(np.float32)))
+
+
+def get_step(block_size, columns):
+    """
+    Число строк за шаг, при котором в блоке оценок не больше
+    MAX_BLOCK_CELLS ячеек даже для почти плотных строк.
+    """
+    return max(min(block_size, MAX_BLOCK_CELLS // max(columns, 1)), 1)
+
+
+def top_k(scores, k, exclude):
+    """
+    Индексы и значения k наибольших положительных оценок в каждой строке.
+
+    scores и exclude - разреженные матрицы одной формы, ненулевые
+    позиции exclude в результат не попадают.
+    """
+    scores = scores.tocsr()
+    exclude = exclude.tocsr()
+    for row in range(scores.shape[0]):
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        columns = scores.indices[start:end]
+        values = scores.data[start:end]
+        keep = (values > 0) & ~np.isin(columns, exclude.indices[
+            exclude.indptr[row]:exclude.indptr[row + 1]
+        ])
+        columns, values = columns[keep], values[keep]
+        if len(values) > k:
+            best = np.argpartition(-values, k - 1)[:k]
+            columns, values = columns[best], values[best]
+        order = np.argsort(-values, kind='stable')
+        yield row, columns[order], values[order]
+
+
+def iter_similarities(k, block_size):
+    recipe_ids = np.array(
+        Recipe.objects.order_by('id').values_list('id', flat=True),
+        dtype=np.int64,
+    )
+    features = get_recipe_features(recipe_ids)
+    transposed = features.T.tocsr()
+    step = get_step(block_size, len(recipe_ids))
+    for start in range(0, len(recipe_ids), step):
+        scores = features[start:start + step] @ transposed
+        itself = sparse.eye(
+            scores.shape[0], scores.shape[1], k=start, format='csr'
+        )
+        for row, columns, values in top_k(scores, k, itself):
+            recipe_id = int(recipe_ids[start + row])
+            for column, score in zip(columns, values):
+                yield RecipeSimilarity(
+                    recipe_id=recipe_id,
+                    similar_id=int(recipe_ids[column]),
+                    score=float(score),
+                )
+
+
+def iter_recommendations(k, block_size):
+    """
+    Рекомендации по избранному: сумма косинусного сходства item-item
+    с рецептами, которые пользователь уже добавил в избранное.
+    """
+    favorites = get_pairs(
+        Favorite.objects.filter(recipe__in=Recipe.objects.values('id')),
+        'user_id', 'recipe_id'
+    )
+    user_ids, rows = np.unique(favorites[:, 0], return_inverse=True)
+    recipe_ids, columns = np.unique(favorites[:, 1], return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, columns)),
+        shape=(len(user_ids), len(recipe_ids)),
+    )
+    matrix.data[:] = 1
+    by_recipe = normalize_rows(matrix.T.tocsr())
+    by_user = by_recipe.T.tocsr()
+    step = get_step(block_size, len(recipe_ids))
+    for start in range(0, len(user_ids), step):
+        block = matrix[start:start + step]
+        scores = (block @ by_recipe) @ by_user
+        for row, columns, values in top_k(scores, k, block):
+            user_id = int(user_ids[start + row])
+            for column, score in zip(columns, values):
+                yield UserRecommendation(
+                    user_id=user_id,
+                    recipe_id=int(recipe_ids[column]),
+                    score=float(score),
+                )
+
+
+def replace_all(model, objs):
+    """
+    Заменяет содержимое таблицы, вставляя объекты пачками.
+    """
+    model.objects.all().delete()
+    count = 0
+    while True:
+        batch = list(islice(objs, INSERT_BATCH_SIZE))
+        if not batch:
+            return count
+        model.objects.bulk_create(batch)
+        count += len(batch)
@@ -0,0 +1,133 @@
+from collections import defaultdict
+
+from django.contrib.auth.models import AnonymousUser
+
+from users.models import Follow, User
+
+from .models import AmountIngredient, Recipe
+
+RECIPE_FIELDS = (
+    'id', 'tags', 'author', 'ingredients',
+    'is_favorited', 'is_in_shopping_cart',
+    'name', 'image', 'text', 'cooking_time',
+)
+CARD_FIELDS = ('id', 'name', 'image', 'cooking_time')
+RECIPE_VALUES = ('id', 'author_id', 'name', 'image', 'text', 'cooking_time')
+USER_VALUES = ('email', 'id', 'username', 'first_name', 'last_name')
+USER_FLAGS = ('is_favorited', 'is_in_shopping_cart')
+
+
+def get_image_url(name, request):
+    """
+    Повторяет Base64ImageField(use_url=True) для имени файла из values().
+    """
+    if not name:
+        return None
+    url = Recipe._meta.get_field('image').storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def get_tags_data(recipe_ids):
+    tags = defaultdict(list)
+    rows = Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list(
+        'recipe_id', 'tag__id', 'tag__name', 'tag__color', 'tag__slug'
+    ).order_by('tag__id')
+    for recipe_id, tag_id, name, color, slug in rows:
+        tags[recipe_id].append(
+            {'id': tag_id, 'name': name, 'color': color, 'slug': slug}
+        )
+    return tags
+
+
+def get_ingredients_data(recipe_ids):
+    ingredients = defaultdict(list)
+    rows = AmountIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list(
+        'recipe_id', 'ingredients__id', 'ingredients__name',
+        'ingredients__measurement_unit', 'amount',
+    ).order_by('id')
+    for recipe_id, ingredient_id, name, measurement_unit, amount in rows:
+        ingredients[recipe_id].append({
+            'id': ingredient_id,
+            'name': name,
+            'measurement_unit': measurement_unit,
+            'amount': amount,
+        })
+    return ingredients
+
+
+def get_authors_data(author_ids, user):
+    authors = {
+        author['id']: author for author in
+        User.objects.filter(id__in=author_ids).values(*USER_VALUES)
+    }
+    subscribed = set()
+    if user.is_authenticated:
+        subscribed = set(Follow.objects.filter(
+            user=user, author_id__in=author_ids
+        ).values_list('author_id', flat=True))
+    for author_id, author in authors.items():
+        author['is_subscribed'] = author_id in subscribed
+    return authors
+
+
+def get_value_fields(fields, user):
+    """
+    Колонки рецепта, которые нужно выбрать для заданных полей ответа.
+    """
+    columns = ['id']
+    columns += [
+        column for column in RECIPE_VALUES[2:] if column in fields
+    ]
+    if 'author' in fields:
+        columns.append('author_id')
+    if user.is_authenticated:
+        columns += [flag for flag in USER_FLAGS if flag in fields]
+    return columns
+
+
+def get_recipes_data(rows, request, fields=RECIPE_FIELDS):
+    """
+    Собирает представление рецептов без сериализаторов DRF.
+
+    Принимает строки рецептов из values(get_value_fields(...)) и
+    возвращает список словарей, совпадающий с RecipeSerializer по
+    составу и порядку полей. Связанные данные загружаются отдельными
+    запросами на всю страницу и только для запрошенных полей. Без
+    request ссылки на картинки относительные, а флаги пользователя
+    не заполняются.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+    recipe_ids = [row['id'] for row in rows]
+    tags = get_tags_data(recipe_ids) if 'tags' in fields else None
+    ingredients = (
+        get_ingredients_data(recipe_ids) if 'ingredients' in fields
+        else None
+    )
+    authors = get_authors_data(
+        {row['author_id'] for row in rows},
+        getattr(request, 'user', AnonymousUser())
+    ) if 'author' in fields else None
+    data = []
+    for row in rows:
+        recipe = {}
+        for field in fields:
+            if field == 'tags':
+                recipe[field] = tags[row['id']]
+            elif field == 'author':
+                recipe[field] = authors.get(row['author_id'])
+            elif field == 'ingredients':
+                recipe[field] = ingredients[row['id']]
+            elif field == 'image':
+                recipe[field] = get_image_url(row['image'], request)
+            elif field in row:
+                recipe[field] = row[field]
+        data.append(recipe)
+    return data
@@ -0,0 +1,138 @@
+from itertools import islice
+
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from events.outbox import record_many
+from users.models import Follow
+
+from .models import Favorite, Recipe, RecipeSnapshot, ShoppingCart
+from .representations import (RECIPE_FIELDS, USER_FLAGS, USER_VALUES,
+                              get_recipes_data, get_value_fields)
+
+SNAPSHOT_FIELDS = tuple(
+    field for field in RECIPE_FIELDS if field not in USER_FLAGS
+)
+SNAPSHOT_BATCH_SIZE = 500
+# JSONB в PostgreSQL не сохраняет порядок ключей, поэтому при чтении
+# словари собираются заново в порядке полей сериализаторов.
+AUTHOR_KEYS = USER_VALUES + ('is_subscribed',)
+TAG_KEYS = ('id', 'name', 'color', 'slug')
+INGREDIENT_KEYS = ('id', 'name', 'measurement_unit', 'amount')
+
+
+def refresh_snapshots(recipe_ids):
+    """
+    Пересобирает снимки рецептов и возвращает их количество.
+
+    Снимок - публичное представление рецепта без флагов пользователя
+    и с относительной ссылкой на картинку.
+    """
+    rows = Recipe.objects.filter(id__in=recipe_ids).values(
+        *get_value_fields(SNAPSHOT_FIELDS, AnonymousUser())
+    )
+    data = get_recipes_data(rows, None, SNAPSHOT_FIELDS)
+    RecipeSnapshot.objects.filter(recipe_id__in=recipe_ids).delete()
+    RecipeSnapshot.objects.bulk_create([
+        RecipeSnapshot(recipe_id=recipe['id'], data=recipe)
+        for recipe in data
+    ], ignore_conflicts=True)
+    return len(data)
+
+
+def touch_recipes(**lookup):
+    """
+    Сразу меняет дату изменения рецептов, отобранных по lookup.
+
+    ETag рецептов меняется в той же транзакции, что и правка тэга,
+    ингредиента или автора; снимки затем пересобирает задача
+    refresh_related_snapshots и меняет дату еще раз.
+    """
+    Recipe.objects.filter(**lookup).update(updated_at=timezone.now())
+
+
+def refresh_related_snapshots(**lookup):
+    """
+    Пересобирает снимки рецептов, отобранных по lookup, пачками.
+
+    Дата изменения рецептов тоже обновляется, чтобы сбросить их ETag, а
+    в outbox пишутся события об их изменении.
+    """
+    recipe_ids = Recipe.objects.filter(**lookup).order_by('id').values_list(
+        'id', flat=True
+    ).iterator(chunk_size=SNAPSHOT_BATCH_SIZE)
+    while True:
+        batch = list(islice(recipe_ids, SNAPSHOT_BATCH_SIZE))
+        if not batch:
+            return
+        Recipe.objects.filter(id__in=batch).update(updated_at=timezone.now())
+        refresh_snapshots(batch)
+        record_many('recipe', 'updated', [
+            {'recipe_id': recipe_id} for recipe_id in batch
+        ])
+
+
+def render_snapshot(row, request):
+    data = row['data']
+    recipe = {}
+    for field in RECIPE_FIELDS:
+        if field == 'author':
+            author = data['author']
+            if author is not None:
+                author = {key: author[key] for key in AUTHOR_KEYS}
+                author['is_subscribed'] = row.get('is_subscribed', False)
+            recipe[field] = author
+        elif field == 'tags':
+            recipe[field] = [
+                {key: tag[key] for key in TAG_KEYS} for tag in data['tags']
+            ]
+        elif field == 'ingredients':
+            recipe[field] = [
+                {key: ingredient[key] for key in INGREDIENT_KEYS}
+                for ingredient in data['ingredients']
+            ]
+        elif field == 'image':
+            recipe[field] = data['image'] and request.build_absolute_uri(
+                data['image']
+            )
+        elif field in USER_FLAGS:
+            if field in row:
+                recipe[field] = row[field]
+        else:
+            recipe[field] = data[field]
+    return recipe
+
+
+def get_snapshot(recipe_id, user):
+    """
+    Строка рецепта для render_snapshot: дата изменения, снимок и флаги
+    текущего пользователя.
+
+    Все читается одним запросом по рецепту. Отсутствующий снимок
+    (например, у импортированного рецепта) создается при первом чтении.
+    Возвращает None, если рецепта нет.
+    """
+    queryset = Recipe.objects.filter(id=recipe_id)
+    values = ['updated_at', 'snapshot__data']
+    if user.is_authenticated:
+        queryset = queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe_id=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe_id=OuterRef('pk')
+            )),
+            is_subscribed=Exists(Follow.objects.filter(
+                user=user, author_id=OuterRef('author_id')
+            )),
+        )
+        values += [*USER_FLAGS, 'is_subscribed']
+    row = queryset.values(*values).first()
+    if row is not None and row['snapshot__data'] is None:
+        refresh_snapshots([recipe_id])
+        row = queryset.values(*values).first()
+    if row is None:
+        return None
+    row['data'] = row.pop('snapshot__data')
+    return row
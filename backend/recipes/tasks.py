@@ -0,0 +1,38 @@
+from jobs.queue import task
+
+from . import archive, carts, feed, images, snapshots
+
+
+@task
+def fan_out_recipe(recipe_id):
+    feed.fan_out_recipe(recipe_id)
+
+
+@task
+def fan_out_author(author_id):
+    feed.fan_out_author(author_id)
+
+
+@task
+def backfill_feed(user_id, author_id):
+    feed.backfill_feed(user_id, author_id)
+
+
+@task
+def refresh_related_snapshots(**lookup):
+    snapshots.refresh_related_snapshots(**lookup)
+
+
+@task
+def purge_deleted_recipes():
+    archive.purge_deleted_recipes()
+
+
+@task
+def reencode_image(recipe_id, name):
+    images.reencode_image(recipe_id, name)
+
+
+@task
+def export_shopping_cart(user_id):
+    carts.export_shopping_cart(user_id)
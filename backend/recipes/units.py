@@ -0,0 +1,68 @@
+from django.db.models import (BigIntegerField, Case, CharField, F, Sum, Value,
+                              When)
+
+# Единица из data/ingredients.csv -> (базовая единица, множитель).
+# Единицы, которых здесь нет (шт., пучок, по вкусу...), не пересчитываются.
+UNIT_CONVERSIONS = {
+    'кг': ('г', 1000),
+    'л': ('мл', 1000),
+    'стакан': ('мл', 200),
+    'ст. л.': ('мл', 15),
+    'ч. л.': ('мл', 5),
+}
+
+# Базовая единица -> (крупная единица, множитель) для вывода.
+DISPLAY_UNITS = {
+    'г': ('кг', 1000),
+    'мл': ('л', 1000),
+}
+
+
+def base_unit(unit_field):
+    return Case(
+        *(When(**{unit_field: unit}, then=Value(base))
+          for unit, (base, _) in UNIT_CONVERSIONS.items()),
+        default=F(unit_field),
+        output_field=CharField(),
+    )
+
+
+def base_amount(unit_field, amount):
+    return Case(
+        *(When(**{unit_field: unit}, then=amount * factor)
+          for unit, (_, factor) in UNIT_CONVERSIONS.items()),
+        default=amount,
+        output_field=BigIntegerField(),
+    )
+
+
+def aggregate_ingredients(queryset, amount=F('amount')):
+    """
+    Суммирует ингредиенты из queryset AmountIngredient в базовых единицах.
+
+    Пересчет и группировка выполняются одним SQL-запросом, так что
+    "сахар, кг" и "сахар, г" сливаются в одну строку. Количество
+    считается в bigint: наибольшее количество ингредиента, умноженное на
+    число порций и множитель единицы, в integer не помещается.
+    """
+    unit_field = 'ingredients__measurement_unit'
+    return queryset.annotate(
+        unit=base_unit(unit_field)
+    ).values('ingredients__name', 'unit').annotate(
+        value=Sum(base_amount(unit_field, amount))
+    ).order_by('ingredients__name', 'unit')
+
+
+def humanize_amount(value, unit):
+    """
+    Переводит количество в крупную единицу, если так нагляднее.
+
+    >>> humanize_amount(1500, 'г')
+    ('1,5', 'кг')
+    """
+    if unit in DISPLAY_UNITS:
+        display_unit, factor = DISPLAY_UNITS[unit]
+        if value >= factor:
+            value, unit = value / factor, display_unit
+    text = f'{value:.2f}'.rstrip('0').rstrip('.').replace('.', ',')
+    return text, unit
@@ -1,18 +1,47 @@
 from django.contrib import admin
 
+from foodgram.admin_filters import InputFilter
+from jobs.queue import enqueue
+from recipes.snapshots import touch_recipes
+from recipes.tasks import refresh_related_snapshots
+
+from .counters import COUNTERS
 from .models import Follow, User
 
 
+class EmailFilter(InputFilter):
+    title = 'email'
+    parameter_name = 'email'
+    lookup = 'email__istartswith'
+
+
+class FollowAuthorFilter(InputFilter):
+    title = 'автору'
+    parameter_name = 'author'
+    lookup = 'author__username'
+
+
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
-    list_display = ('id', 'username', 'email', 'first_name', 'last_name',)
-    list_filter = ('first_name', 'email',)
-    search_fields = ('username', 'email',)
+    list_display = (
+        'id', 'username', 'email', 'first_name', 'last_name',
+        'recipes_count', 'followers_count',
+    )
+    list_filter = (EmailFilter, 'is_staff', 'is_active',)
+    search_fields = ('^username', '^email',)
+    readonly_fields = COUNTERS
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change:
+            touch_recipes(author_id=obj.id)
+            enqueue(refresh_related_snapshots, author_id=obj.id)
 
 
 @admin.register(Follow)
 class FollowAdmin(admin.ModelAdmin):
-    search_fields = ('user', 'author',)
-    list_filter = ('author',)
+    search_fields = ('user__username', 'author__username',)
+    list_filter = (FollowAuthorFilter,)
     list_display = ('user', 'author',)
+    list_select_related = ('user', 'author',)
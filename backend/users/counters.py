@@ -0,0 +1,91 @@
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes.models import Favorite, Recipe
+
+from .models import Follow, User
+
+COUNTERS = (
+    'recipes_count', 'followers_count', 'following_count', 'favorites_count',
+)
+RECONCILE_BATCH_SIZE = 1000
+
+
+def change_counter(field, user_ids, delta=1):
+    """
+    Атомарно меняет счетчик пользователей на delta за каждое вхождение
+    id в user_ids. Счетчик не опускается ниже нуля.
+    """
+    amounts = defaultdict(list)
+    for user_id, count in Counter(user_ids).items():
+        if user_id is not None:
+            amounts[count * delta].append(user_id)
+    for amount, ids in amounts.items():
+        User.objects.filter(id__in=ids).update(**{field: Greatest(
+            F(field) + amount, Value(0)
+        )})
+
+
+def change_follow_counters(user_id, author_id, delta):
+    """
+    Меняет счетчики подписок и подписчиков.
+
+    Строки обновляются по возрастанию id, чтобы встречные подписки двух
+    пользователей не блокировали друг друга.
+    """
+    updates = sorted(
+        ((user_id, 'following_count'), (author_id, 'followers_count'))
+    )
+    for counter_user_id, field in updates:
+        change_counter(field, [counter_user_id], delta)
+
+
+def count_subquery(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(count=Count('id')).values('count')
+    ), Value(0))
+
+
+def get_actual_counters():
+    return {
+        'recipes_count': count_subquery(Recipe.objects.all(), 'author'),
+        'followers_count': count_subquery(Follow.objects.all(), 'author'),
+        'following_count': count_subquery(Follow.objects.all(), 'user'),
+        'favorites_count': count_subquery(
+            Favorite.objects.filter(recipe__deleted_at__isnull=True), 'user'
+        ),
+    }
+
+
+def reconcile_counters(batch_size=RECONCILE_BATCH_SIZE, user_ids=None):
+    """
+    Пересчитывает счетчики пачками пользователей и возвращает число
+    пользователей, у которых они разошлись с данными.
+
+    Если передан user_ids, проверяются только эти пользователи.
+    """
+    actual = get_actual_counters()
+    users = User.objects.all()
+    if user_ids is not None:
+        users = users.filter(id__in=user_ids)
+    user_ids = users.order_by('id').values_list(
+        'id', flat=True
+    ).iterator(chunk_size=batch_size)
+    fixed = 0
+    while True:
+        batch = list(islice(user_ids, batch_size))
+        if not batch:
+            return fixed
+        drifted = list(User.objects.filter(id__in=batch).alias(
+            **{f'actual_{field}': value for field, value in actual.items()}
+        ).filter(
+            ~Q(**{field: F(f'actual_{field}') for field in COUNTERS})
+        ).values_list('id', flat=True))
+        if drifted:
+            User.objects.filter(id__in=drifted).update(**actual)
+            fixed += len(drifted)
@@ -0,0 +1,18 @@
+from django.core.management import BaseCommand
+
+from users.counters import RECONCILE_BATCH_SIZE, reconcile_counters
+
+
+class Command(BaseCommand):
+    help = ('Сверяет счетчики рецептов, подписок и избранного '
+            'пользователей с данными и исправляет расхождения')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=RECONCILE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        fixed = reconcile_counters(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлены счетчики пользователей: {fixed}'
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-19 10:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_auto_20230620_1925'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='collections_version',
+            field=models.PositiveIntegerField(default=0, verbose_name='Версия избранного, корзины и подписок'),
+        ),
+    ]
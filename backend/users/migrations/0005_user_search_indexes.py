@@ -0,0 +1,38 @@
+# Generated by Django 3.2.15 on 2026-10-19 10:52
+
+from django.db import migrations
+
+# Поиск ^username и ^email превращается в UPPER("col"::text) LIKE 'X%'.
+# Такие индексы поддерживает только PostgreSQL.
+SEARCH_INDEXES = (
+    ('users_user_username_upper_idx', 'username'),
+    ('users_user_email_upper_idx', 'email'),
+)
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in SEARCH_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON users_user '
+            f'(UPPER({column}::text) text_pattern_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in SEARCH_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_user_collections_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
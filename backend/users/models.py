@@ -29,6 +29,26 @@ class User(AbstractUser):
         'Фамилия пользователя',
         max_length=150,
     )
+    collections_version = models.PositiveIntegerField(
+        'Версия избранного, корзины и подписок',
+        default=0,
+    )
+    recipes_count = models.PositiveIntegerField(
+        'Рецептов',
+        default=0,
+    )
+    followers_count = models.PositiveIntegerField(
+        'Подписчиков',
+        default=0,
+    )
+    following_count = models.PositiveIntegerField(
+        'Подписок',
+        default=0,
+    )
+    favorites_count = models.PositiveIntegerField(
+        'Рецептов в избранном',
+        default=0,
+    )
 
     class Meta:
         verbose_name = 'Пользователь'
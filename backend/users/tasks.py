@@ -0,0 +1,8 @@
+from jobs.queue import task
+
+from . import counters
+
+
+@task
+def reconcile_counters(user_ids):
+    counters.reconcile_counters(user_ids=user_ids)